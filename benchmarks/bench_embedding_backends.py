@@ -0,0 +1,91 @@
+"""Parity check and latency/memory benchmark of the title embedding backends.
+
+Every backend is compared with full precision PyTorch on the same titles. The script exits
+with status 1 if a backend's minimum cosine similarity is below --threshold.
+
+    python benchmarks/bench_embedding_backends.py --backends torch torch-int8 onnx
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from storyzerapi.module.embedding import BACKENDS, _current_rss_bytes, load_model  # noqa: E402
+
+TITLES = [
+    "The Avengers", "Parasite", "The Dark Knight", "Spirited Away", "Inception",
+    "Mad Max: Fury Road", "Train to Busan", "The Grand Budapest Hotel", "Interstellar", "Oldboy",
+    "A Quiet Place", "Everything Everywhere All at Once", "The Shawshank Redemption", "Whiplash",
+    "Pan's Labyrinth", "Get Out", "La La Land", "Memories of Murder", "Toy Story", "Arrival",
+]
+
+
+def example_titles():
+    with open(os.path.join(ROOT, 'storyzerapi', 'formats', 'movie_examples.json'), 'r', encoding='utf-8') as f:
+        examples = json.load(f)
+    return [movie['title'] for movie in examples.values() if isinstance(movie, dict) and 'title' in movie]
+
+
+def cosine(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return np.sum(a * b, axis=1)
+
+
+def latency(model, titles, batch_size, repeat):
+    model.encode(titles[:batch_size], batch_size=batch_size) # warm up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for start in range(0, len(titles), batch_size):
+            model.encode(titles[start:start + batch_size], batch_size=batch_size)
+    return (time.perf_counter() - started) / (repeat * len(titles))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='all-mpnet-base-v1')
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument('--onnx-file', default=None, help='ONNX file inside the model repository')
+    parser.add_argument('--threshold', type=float, default=0.99, help='minimum cosine similarity to torch')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    titles = TITLES + example_titles()
+    reference = None
+    failed = False
+    print(f"{'backend':<12}{'min cos':>10}{'mean cos':>10}{'ms/title b1':>14}{'ms/title b32':>14}{'load s':>9}{'rss MB':>9}")
+    for backend in ['torch'] + [backend for backend in args.backends if backend != 'torch']:
+        gc.collect()
+        rss_before = _current_rss_bytes()
+        started = time.perf_counter()
+        model = load_model(args.model, device='cpu', backend=backend, onnx_file=args.onnx_file)
+        load_seconds = time.perf_counter() - started
+        rss = (_current_rss_bytes() - rss_before) / 2**20
+
+        embeddings = np.asarray(model.encode(titles), dtype=np.float32)
+        if reference is None:
+            reference = embeddings
+        similarity = cosine(reference, embeddings)
+        if similarity.min() < args.threshold:
+            failed = True
+
+        single = latency(model, titles, 1, args.repeat)
+        batched = latency(model, titles, 32, args.repeat)
+        print(f"{backend:<12}{similarity.min():>10.4f}{similarity.mean():>10.4f}"
+              f"{single * 1e3:>14.2f}{batched * 1e3:>14.2f}{load_seconds:>9.2f}{rss:>9.1f}")
+        del model
+
+    if failed:
+        print(f"FAIL: a backend is below the cosine similarity threshold {args.threshold}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Micro-benchmark of the Vertex AI feature-row builder.
+
+Compares the per-request pandas DataFrame path that MoviePredictionView used before with
+storyzerapi.module.features (single row and batched).
+
+    python benchmarks/bench_features.py --rows 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storyzerapi.module.features import COLUMNS, encode_instance, encode_instances  # noqa: E402
+
+
+def dataframe_instance(embedding, budget, language, runtime, genres):
+    # Previous implementation, kept here as the baseline
+    df = pd.DataFrame(columns=COLUMNS)
+    df['title_embed'] = [embedding]
+    df['budget'] = [budget]
+    df['original_language'] = [language]
+    df['runtime'] = [runtime]
+    for genre in genres:
+        df['genre_'+genre] = [1]
+    df.fillna(0, inplace=True)
+    df = df.astype(str)
+    return df.iloc[0].to_dict()
+
+
+def timeit(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200, help='rows per measurement')
+    parser.add_argument('--dim', type=int, default=768, help='embedding dimension')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((args.rows, args.dim)).astype(np.float32)
+    genres = [['Action', 'Adventure', 'Drama'][:1 + i % 3] for i in range(args.rows)]
+    budgets = [str(1000000 * (i + 1)) for i in range(args.rows)]
+    languages = ['en'] * args.rows
+    runtimes = ['120'] * args.rows
+
+    # Same output for genres the old path handled correctly
+    legacy = dataframe_instance(embeddings[0], budgets[0], 'en', '120', genres[0])
+    assert legacy == encode_instance(embeddings[0], budgets[0], 'en', '120', genres[0]), "feature rows differ"
+
+    dataframe_row = timeit(lambda: [dataframe_instance(embeddings[i], budgets[i], languages[i], runtimes[i], genres[i])
+                                    for i in range(args.rows)], 1) / args.rows
+    encoder_row = timeit(lambda: [encode_instance(embeddings[i], budgets[i], languages[i], runtimes[i], genres[i])
+                                  for i in range(args.rows)], 1) / args.rows
+    encoder_batch = timeit(lambda: encode_instances(embeddings, budgets, languages, runtimes, genres), 1) / args.rows
+
+    print(f"rows: {args.rows}, embedding dim: {args.dim}")
+    print(f"{'pandas DataFrame (per row)':<32}{dataframe_row * 1e3:10.3f} ms/row")
+    print(f"{'encode_instance (per row)':<32}{encoder_row * 1e3:10.3f} ms/row  x{dataframe_row / encoder_row:.1f}")
+    print(f"{'encode_instances (batch)':<32}{encoder_batch * 1e3:10.3f} ms/row  x{dataframe_row / encoder_batch:.1f}")
+
+
+if __name__ == '__main__':
+    main()
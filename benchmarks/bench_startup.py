@@ -0,0 +1,89 @@
+"""Cold-start time of the Django process.
+
+Measures, each in a fresh interpreter:
+  - `python manage.py check`
+  - a gunicorn worker, from spawning gunicorn until the first answered request
+
+with the settings of benchmarks/loadtest_settings.py (no config.ini or database server needed).
+Embedding warm-up is off unless --warmup is given, so the numbers are the framework and import cost.
+
+    python benchmarks/bench_startup.py --repeat 5
+    python benchmarks/bench_startup.py --role api
+"""
+import argparse
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+
+
+def environment(args, workdir):
+    env = dict(os.environ)
+    env.update({
+        'DJANGO_SETTINGS_MODULE': 'loadtest_settings',
+        'PYTHONPATH': os.pathsep.join([ROOT, BENCHMARKS, env.get('PYTHONPATH', '')]).rstrip(os.pathsep),
+        'LOADTEST_DB': os.path.join(workdir, 'db.sqlite3'),
+        'LOADTEST_EMBEDDING_WARMUP': '1' if args.warmup else '0',
+        'PROMETHEUS_MULTIPROC_DIR': os.path.join(workdir, 'prometheus'),
+        'GUNICORN_BIND': f'127.0.0.1:{args.port}',
+        'GUNICORN_WORKERS': '1',
+        'STORYZER_PRELOAD': '0',
+        'STORYZER_ROLE': args.role,
+    })
+    os.makedirs(env['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+    return env
+
+
+def manage_check(env):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, 'manage.py', 'check'], env=env, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def gunicorn_worker(env, port, timeout=120.0):
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py')],
+                              env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                sys.exit(f"gunicorn exited with {server.returncode}")
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+                connection.request('GET', '/metrics') # served by every role
+                if connection.getresponse().status == 200:
+                    return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.02)
+        sys.exit(f"gunicorn did not answer within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def show(name, values):
+    print(f"{name:<22}min {min(values):6.3f}s   median {statistics.median(values):6.3f}s   max {max(values):6.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--port', type=int, default=8198)
+    parser.add_argument('--warmup', action='store_true', help='load the embedding model at startup')
+    parser.add_argument('--role', default='all', choices=['all', 'api', 'prediction'], help='worker role (STORYZER_ROLE)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='storyzer-startup-') as workdir:
+        env = environment(args, workdir)
+        show('manage.py check', [manage_check(env) for _ in range(args.repeat)])
+        show('gunicorn worker', [gunicorn_worker(env, args.port) for _ in range(args.repeat)])
+
+
+if __name__ == '__main__':
+    main()
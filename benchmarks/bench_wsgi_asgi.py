@@ -0,0 +1,115 @@
+"""Throughput of the same workers under WSGI (gunicorn gthread) and ASGI (uvicorn, native async views).
+
+Starts the app twice on the load test setup of benchmarks/loadtest.py (SQLite, fake OpenAI and
+Vertex AI): once as storyzer.wsgi with GUNICORN_THREADS threads per worker, once as storyzer.asgi
+with the uvicorn worker. Each is driven at every --concurrency level and reported as throughput
+and p50/p95/p99 latency. With a slow upstream the WSGI worker tops out at threads / latency
+requests per second, the ASGI worker should keep scaling with the concurrency.
+
+    python benchmarks/bench_wsgi_asgi.py
+    python benchmarks/bench_wsgi_asgi.py --endpoints prediction --concurrency 8 32 128 --workers 2 --threads 8
+
+Needs uvicorn (requirements.txt).
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import tempfile
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCHMARKS)
+
+from fakes import add_profile_arguments, profile_from_args, start_openai, start_vertex  # noqa: E402
+from loadtest import environment, prepare_database, report, run, start_server  # noqa: E402
+
+INTERFACES = {
+    # name: (GUNICORN_WSGI_APP, GUNICORN_WORKER_CLASS)
+    'wsgi': ('storyzer.wsgi:application', 'sync'),
+    'asgi': ('storyzer.asgi:application', 'uvicorn.workers.UvicornWorker'),
+}
+
+
+def measure(args, interface, env, token):
+    app, worker_class = INTERFACES[interface]
+    env = dict(env, GUNICORN_WSGI_APP=app, GUNICORN_WORKER_CLASS=worker_class)
+    server = start_server(env, args.port, args.startup_timeout)
+    rows = {}
+    try:
+        for concurrency in args.concurrency:
+            level = copy.copy(args)
+            level.concurrency = concurrency
+            level.requests = max(args.requests, concurrency * args.rounds)
+            results, elapsed = run(level, args.port, token)
+            summary = report(results, elapsed)
+            latencies = list(summary['endpoints'].values())
+            rows[concurrency] = {
+                "throughput": summary['throughput'],
+                "p50": max((row['p50'] for row in latencies), default=0.0),
+                "p95": max((row['p95'] for row in latencies), default=0.0),
+                "p99": max((row['p99'] for row in latencies), default=0.0),
+                "errors": sum(summary['errors'].values()),
+            }
+            print(f"{interface} concurrency {concurrency}: {rows[concurrency]}", flush=True)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return rows
+
+
+def print_table(results):
+    print(f"\n{'interface':<10}{'concurrency':>12}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for interface, rows in results.items():
+        for concurrency, row in rows.items():
+            print(f"{interface:<10}{concurrency:>12}{row['throughput']:>10}{row['p50']:>10}{row['p95']:>10}"
+                  f"{row['p99']:>10}{row['errors']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--interfaces', nargs='+', default=list(INTERFACES), choices=INTERFACES)
+    parser.add_argument('--endpoints', nargs='+', default=['chatgpt'],
+                        choices=['prediction', 'chatgpt', 'translate'])
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[8, 32, 128, 256])
+    parser.add_argument('--requests', type=int, default=200, help='minimum measured requests per level')
+    parser.add_argument('--rounds', type=int, default=3, help='at least this many requests per client per level')
+    parser.add_argument('--warmup', type=int, default=10, help='requests sent before measuring each level')
+    parser.add_argument('--unique-titles', action='store_true', help='make every title unique (no embedding cache hits)')
+    parser.add_argument('--timeout', type=float, default=300.0, help='client timeout per request in seconds')
+    parser.add_argument('--port', type=int, default=8199)
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn workers, for both interfaces')
+    parser.add_argument('--threads', type=int, default=8, help='threads per WSGI worker')
+    parser.add_argument('--startup-timeout', type=float, default=300.0)
+    parser.add_argument('--vertex-workers', type=int, default=512, help='threads of the fake Vertex AI server')
+    add_profile_arguments(parser, 'openai', 800)
+    add_profile_arguments(parser, 'vertex', 60)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+    args.llm_cache = False
+    args.batch_size = 1
+
+    openai_server = start_openai(profile=profile_from_args(args, 'openai'))
+    vertex_server, vertex_port = start_vertex(profile=profile_from_args(args, 'vertex'),
+                                              max_workers=args.vertex_workers)
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='storyzer-wsgi-asgi-') as workdir:
+        env = environment(args, workdir, openai_server.server_port, vertex_port)
+        token = prepare_database(env)
+        for interface in args.interfaces:
+            results[interface] = measure(args, interface, env, token)
+    openai_server.shutdown()
+    vertex_server.stop(None)
+
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"config": {key: value for key, value in vars(args).items() if key != 'json'},
+                       "results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""Local stand-ins for the OpenAI chat API and the Vertex AI PredictionService.
+
+Both answer with well-formed but made-up results after a random delay and fail a configurable
+fraction of the calls, so the app can be load-tested without OpenAI credits or Vertex quota.
+Used by benchmarks/loadtest.py, or on their own:
+
+    python benchmarks/fakes.py --openai-port 8100 --vertex-port 8101 --openai-latency 800 --vertex-latency 60
+
+then point config.ini at them:
+
+    [OPENAI]     API_BASE = http://127.0.0.1:8100/v1
+    [VERTEX_AI]  API_ENDPOINT = 127.0.0.1:8101, INSECURE = true,
+                 CLASSIFICATION_ENDPOINT = classification, REVENUE_ENDPOINT = revenue, VOTE_ENDPOINT = vote_average
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SCENARIO_TYPES = 20 # entries in keywords.json
+
+REPLY = ("The story follows a struggling family whose members find work in a wealthy household. "
+         "It mixes comedy and suspense, and the genre averages suggest a solid box office performance "
+         "with a vote average above the genre mean. ")
+
+
+class LatencyProfile():
+    """Log-normal delay around median_ms (sigma 0 for a constant delay) and an error rate.
+
+    Log-normal gives the long right tail typical of remote API latencies."""
+    def __init__(self, median_ms=0.0, sigma=0.5, error_rate=0.0, seed=None):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self):
+        if self.median_ms <= 0:
+            return 0.0
+        with self._lock:
+            return self.median_ms * math.exp(self._random.gauss(0.0, self.sigma)) / 1000
+
+    def fails(self):
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def to_dict(self):
+        return {"median_ms": self.median_ms, "sigma": self.sigma, "error_rate": self.error_rate}
+
+
+# OpenAI
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # keep-alive, like the real API
+    profile = LatencyProfile()
+    error_status = 429
+    reply_words = 120
+    chunk_ms = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=()):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            return self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+
+        time.sleep(self.profile.delay())
+        if self.profile.fails():
+            return self._send_json(self.error_status,
+                                   {"error": {"message": "Fake upstream error", "type": "server_error"}},
+                                   headers=[('Retry-After', '1')] if self.error_status == 429 else ())
+
+        words = (REPLY * (self.reply_words // len(REPLY.split()) + 1)).split()[:self.reply_words]
+        model = request.get('model', 'gpt-4')
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        if request.get('stream'):
+            return self._stream(completion_id, model, words)
+
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(words), "total_tokens": len(words)},
+        })
+
+    def _stream(self, completion_id, model, words):
+        # Server-sent events, one word per chunk, chunk_ms apart
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        for index, word in enumerate(words):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model,
+                     "choices": [{"index": 0, "delta": {"content": word if index == 0 else " " + word},
+                                  "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+            if self.chunk_ms:
+                time.sleep(self.chunk_ms / 1000)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def start_openai(port=0, profile=None, error_status=429, reply_words=120, chunk_ms=0.0, host='127.0.0.1'):
+    """Start the fake OpenAI server in a daemon thread, returns the server (server.server_port)."""
+    handler = type('Handler', (FakeOpenAIHandler,), {
+        'profile': profile or LatencyProfile(), 'error_status': error_status,
+        'reply_words': reply_words, 'chunk_ms': chunk_ms,
+    })
+    # request_queue_size is the listen backlog, the concurrency benchmark connects hundreds of clients at once
+    server = type('Server', (ThreadingHTTPServer,), {'request_queue_size': 1024})((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='fake-openai', daemon=True).start()
+    return server
+
+
+# Vertex AI
+
+
+def _classification(random_):
+    confidences = [random_.random() for _ in range(SCENARIO_TYPES)]
+    total = sum(confidences)
+    return {"confidences": [confidence / total for confidence in confidences],
+            "displayNames": [str(index) for index in range(SCENARIO_TYPES)],
+            "ids": [str(index) for index in range(SCENARIO_TYPES)]}
+
+
+def _regression(endpoint, random_):
+    if endpoint == 'vote_average':
+        return {"value": round(random_.uniform(4.5, 8.5), 3)}
+    return {"value": round(math.exp(random_.gauss(17.0, 1.5)))} # revenue
+
+
+def start_vertex(port=0, profile=None, max_workers=64, host='127.0.0.1'):
+    """Start a plaintext gRPC PredictionService. The endpoint id (the last part of the endpoint path)
+    selects the answer: 'classification' returns scenario type confidences, 'vote_average' and
+    anything else return {'value': ...}. Returns (server, port)."""
+    import grpc
+    from google.cloud.aiplatform_v1.types import PredictRequest, PredictResponse
+
+    profile = profile or LatencyProfile()
+    random_ = random.Random()
+    lock = threading.Lock()
+
+    def predict(request, context):
+        time.sleep(profile.delay())
+        if profile.fails():
+            context.abort(grpc.StatusCode.UNAVAILABLE, "Fake upstream error")
+        endpoint = request.endpoint.rsplit('/', 1)[-1]
+        with lock:
+            if endpoint == 'classification':
+                predictions = [_classification(random_) for _ in request.instances]
+            else:
+                predictions = [_regression(endpoint, random_) for _ in request.instances]
+        return PredictResponse(predictions=predictions, deployed_model_id='fake')
+
+    handler = grpc.method_handlers_generic_handler('google.cloud.aiplatform.v1.PredictionService', {
+        'Predict': grpc.unary_unary_rpc_method_handler(predict,
+                                                       request_deserializer=PredictRequest.deserialize,
+                                                       response_serializer=PredictResponse.serialize),
+    })
+    server = grpc.server(ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fake-vertex'))
+    server.add_generic_rpc_handlers((handler,))
+    port = server.add_insecure_port(f'{host}:{port}')
+    server.start()
+    return server, port
+
+
+def add_profile_arguments(parser, name, median_ms):
+    parser.add_argument(f'--{name}-latency', type=float, default=median_ms, help=f'median {name} latency in ms')
+    parser.add_argument(f'--{name}-sigma', type=float, default=0.5, help=f'log-normal sigma of the {name} latency')
+    parser.add_argument(f'--{name}-error-rate', type=float, default=0.0, help=f'fraction of failing {name} calls')
+
+
+def profile_from_args(args, name):
+    name = name.replace('-', '_')
+    return LatencyProfile(getattr(args, f'{name}_latency'), getattr(args, f'{name}_sigma'),
+                          getattr(args, f'{name}_error_rate'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--openai-port', type=int, default=8100)
+    parser.add_argument('--vertex-port', type=int, default=8101)
+    add_profile_arguments(parser, 'openai', 800)
+    add_profile_arguments(parser, 'vertex', 60)
+    parser.add_argument('--openai-error-status', type=int, default=429)
+    parser.add_argument('--openai-chunk-ms', type=float, default=20, help='delay between streamed chunks')
+    args = parser.parse_args()
+
+    openai_server = start_openai(args.openai_port, profile_from_args(args, 'openai'),
+                                 error_status=args.openai_error_status, chunk_ms=args.openai_chunk_ms)
+    print(f"fake OpenAI:  http://127.0.0.1:{openai_server.server_port}/v1")
+    _, vertex_port = start_vertex(args.vertex_port, profile_from_args(args, 'vertex'))
+    print(f"fake Vertex:  127.0.0.1:{vertex_port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
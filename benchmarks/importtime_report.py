@@ -0,0 +1,97 @@
+"""Import cost of the app modules, based on `python -X importtime`.
+
+For every target module a fresh interpreter runs django.setup() (benchmarks/loadtest_settings.py)
+and then imports the target. Reported per target: wall time and RSS growth of the import, the
+heavy SDKs it pulled in, and the top-level packages with the largest cumulative import time.
+
+    python benchmarks/importtime_report.py
+    python benchmarks/importtime_report.py --targets storyzer.urls storyzerapi.prediction_views --top 15
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+
+TARGETS = ['storyzer.urls', 'storyzerapi.views', 'storyzerapi.prediction_views']
+HEAVY = ['openai', 'numpy', 'pandas', 'torch', 'sentence_transformers', 'google.cloud.aiplatform',
+         'google.protobuf', 'grpc', 'aiohttp']
+MARKER = '--- storyzer import target ---'
+
+CHILD = f"""
+import json, resource, sys, time
+import django
+django.setup()
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+loaded = set(sys.modules)
+sys.stderr.write({MARKER!r} + '\\n')
+started = time.perf_counter()
+__import__(sys.argv[1])
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    "seconds": elapsed,
+    "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before,
+    "heavy": [name for name in sys.argv[2:] if name in sys.modules and name not in loaded],
+}}))
+"""
+
+_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( +)(\S+)')
+
+
+def top_level_imports(stderr):
+    # {package: cumulative microseconds} of the outermost imports after the marker
+    lines = stderr.split(MARKER, 1)[-1].splitlines()
+    entries = [(len(match.group(3)), match.group(4), int(match.group(2)))
+               for match in map(_LINE.match, lines) if match]
+    if not entries:
+        return {}
+    outermost = min(indent for indent, _, _ in entries)
+    return {name: microseconds for indent, name, microseconds in entries if indent == outermost}
+
+
+def measure(target, env):
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', CHILD, target] + HEAVY,
+                             env=env, cwd=ROOT, capture_output=True, text=True)
+    if process.returncode != 0:
+        sys.exit(f"import of {target} failed:\n{process.stderr[-2000:]}")
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result["packages"] = top_level_imports(process.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--targets', nargs='+', default=TARGETS)
+    parser.add_argument('--top', type=int, default=10, help='packages listed per target')
+    parser.add_argument('--json', help='write the report to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='storyzer-importtime-') as workdir:
+        env = dict(os.environ)
+        env.update({
+            'DJANGO_SETTINGS_MODULE': 'loadtest_settings',
+            'PYTHONPATH': os.pathsep.join([ROOT, BENCHMARKS, env.get('PYTHONPATH', '')]).rstrip(os.pathsep),
+            'LOADTEST_DB': os.path.join(workdir, 'db.sqlite3'),
+            'LOADTEST_EMBEDDING_WARMUP': '0',
+        })
+        report = {target: measure(target, env) for target in args.targets}
+
+    for target, result in report.items():
+        print(f"\n{target}: {result['seconds'] * 1000:.0f} ms, +{result['rss_kb'] / 1024:.1f} MB RSS, "
+              f"heavy: {', '.join(result['heavy']) or '-'}")
+        packages = sorted(result['packages'].items(), key=lambda item: item[1], reverse=True)[:args.top]
+        for name, microseconds in packages:
+            print(f"  {microseconds / 1000:9.1f} ms  {name}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
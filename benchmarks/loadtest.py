@@ -0,0 +1,292 @@
+"""Offline load test of the API.
+
+Boots the app under gunicorn on a fresh SQLite database (benchmarks/loadtest_settings.py), with
+OpenAI and Vertex AI replaced by the local fakes of benchmarks/fakes.py, replays
+storyzerapi/formats/movie_examples.json against the selected endpoints at the given concurrency and
+reports throughput and p50/p95/p99 latency per endpoint and per stage (from the Server-Timing header).
+
+    python benchmarks/loadtest.py --endpoints prediction translate genres --concurrency 8 --requests 200
+    python benchmarks/loadtest.py --json base.json                       # save a baseline
+    python benchmarks/loadtest.py --baseline base.json --max-regression 0.2  # exit 1 if a p95 got 20% worse
+
+The embedding model is real and needs to be in the Hugging Face cache (or network) on the first run.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCHMARKS)
+
+from fakes import add_profile_arguments, profile_from_args, start_openai, start_vertex  # noqa: E402
+
+ENDPOINTS = {
+    # name: (method, path, body(movie, args))
+    'prediction': ('POST', '/movie/prediction', lambda movie, args: movie),
+    'batch': ('POST', '/movie/prediction/batch', lambda movie, args: {"movies": [movie] * args.batch_size}),
+    'stream': ('POST', '/movie/prediction/stream', lambda movie, args: movie),
+    'translate': ('POST', '/chatgpt/translate/', lambda movie, args: {"context": movie['scenario']}),
+    'chatgpt': ('POST', '/chatgpt/', lambda movie, args: {"system_prompt": "Summarize the scenario.",
+                                                          "user_prompt": movie['scenario']}),
+    'genres': ('GET', '/average/genres', None),
+    'genre_results': ('GET', '/average/genres/results', None),
+    'results': ('GET', '/result/list', None),
+}
+
+
+def movie_examples():
+    with open(os.path.join(ROOT, 'storyzerapi', 'formats', 'movie_examples.json'), 'r', encoding='utf-8') as f:
+        examples = json.load(f)
+    return [movie for movie in examples.values() if isinstance(movie, dict) and 'title' in movie]
+
+
+def percentile(values, q):
+    # nearest rank
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values), max(1, math.ceil(q * len(values)))) - 1]
+
+
+def summarize(values, seconds=None):
+    summary = {"count": len(values), "p50": percentile(values, 0.5), "p95": percentile(values, 0.95),
+               "p99": percentile(values, 0.99), "max": max(values) if values else 0.0}
+    if seconds:
+        summary["throughput"] = len(values) / seconds
+    return {key: round(value, 2) for key, value in summary.items()}
+
+
+def parse_server_timing(header):
+    # [(name, milliseconds)] of a Server-Timing header value
+    spans = []
+    for entry in (header or '').split(','):
+        name, *params = [part.strip() for part in entry.split(';')]
+        for param in params:
+            if param.startswith('dur='):
+                spans.append((name, float(param[4:])))
+    return spans
+
+
+# Environment
+
+
+def environment(args, workdir, openai_port, vertex_port):
+    env = dict(os.environ)
+    env.update({
+        'DJANGO_SETTINGS_MODULE': 'loadtest_settings',
+        'PYTHONPATH': os.pathsep.join([ROOT, BENCHMARKS, env.get('PYTHONPATH', '')]).rstrip(os.pathsep),
+        'LOADTEST_DB': os.path.join(workdir, 'db.sqlite3'),
+        'LOADTEST_OPENAI_BASE': f'http://127.0.0.1:{openai_port}/v1',
+        'LOADTEST_VERTEX_ENDPOINT': f'127.0.0.1:{vertex_port}',
+        'LOADTEST_LLM_CACHE': '1' if args.llm_cache else '0',
+        'PROMETHEUS_MULTIPROC_DIR': os.path.join(workdir, 'prometheus'),
+        'GUNICORN_BIND': f'127.0.0.1:{args.port}',
+        'GUNICORN_WORKERS': str(args.workers),
+        'GUNICORN_THREADS': str(args.threads),
+    })
+    os.makedirs(env['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+    return env
+
+
+def prepare_database(env):
+    # migrate and create the load test user, prints an access token
+    script = (
+        "import django; django.setup()\n"
+        "from django.core.management import call_command\n"
+        "from rest_framework_simplejwt.tokens import AccessToken\n"
+        "from storyzerapi.models import User\n"
+        "call_command('migrate', verbosity=0)\n"
+        "user, _ = User.objects.get_or_create(email='loadtest@storyzer.local', defaults={'username': 'loadtest'})\n"
+        "print(AccessToken.for_user(user))\n"
+    )
+    output = subprocess.run([sys.executable, '-c', script], env=env, cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout
+    return output.strip().splitlines()[-1]
+
+
+def start_server(env, port, timeout):
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py')],
+                              env=env, cwd=ROOT)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            sys.exit(f"gunicorn exited with {server.returncode}")
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/average/genres')
+            if connection.getresponse().status == 200:
+                return server
+        except OSError:
+            pass
+        time.sleep(0.5)
+    server.terminate()
+    sys.exit(f"gunicorn did not answer within {timeout}s")
+
+
+# Load generator
+
+
+class Client(threading.local):
+    # one keep-alive connection per load generator thread
+    connection = None
+
+
+def send(client, port, token, request, timeout):
+    method, path, body = request
+    headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    started = time.perf_counter()
+    try:
+        if client.connection is None:
+            client.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+        client.connection.request(method, path, body=data, headers=headers)
+        response = client.connection.getresponse()
+        response.read() # a streamed response is timed until its last event
+        if response.getheader('Connection', '').lower() == 'close':
+            client.connection.close()
+            client.connection = None
+        return response.status, time.perf_counter() - started, response.getheader('Server-Timing')
+    except (OSError, http.client.HTTPException) as e:
+        if client.connection is not None:
+            client.connection.close()
+            client.connection = None
+        return type(e).__name__, time.perf_counter() - started, None
+
+
+def build_requests(args, movies):
+    requests_ = []
+    names = itertools.islice(itertools.cycle(args.endpoints), args.requests + args.warmup)
+    for index, name in enumerate(names):
+        method, path, body = ENDPOINTS[name]
+        movie = dict(movies[index % len(movies)])
+        if args.unique_titles:
+            # defeat the title embedding cache
+            movie['title'] = f"{movie['title']} #{index}"
+        requests_.append((name, (method, path, body(movie, args) if body else None)))
+    return requests_
+
+
+def run(args, port, token):
+    requests_ = build_requests(args, movie_examples())
+    client = Client()
+
+    def call(item):
+        name, request = item
+        return name, send(client, port, token, request, args.timeout)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(call, requests_[:args.warmup]))
+        started = time.perf_counter()
+        results = list(executor.map(call, requests_[args.warmup:]))
+        elapsed = time.perf_counter() - started
+    return results, elapsed
+
+
+def report(results, elapsed):
+    latencies, errors, stages = defaultdict(list), defaultdict(int), defaultdict(list)
+    for name, (status, seconds, server_timing) in results:
+        if isinstance(status, int) and status < 400:
+            latencies[name].append(seconds * 1000)
+            for stage, milliseconds in parse_server_timing(server_timing):
+                stages[stage].append(milliseconds)
+        else:
+            errors[f"{name} {status}"] += 1
+
+    return {
+        "elapsed": round(elapsed, 3),
+        "throughput": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "endpoints": {name: summarize(values, elapsed) for name, values in sorted(latencies.items())},
+        "stages": {name: summarize(values) for name, values in sorted(stages.items())},
+        "errors": dict(errors),
+    }
+
+
+def print_report(summary):
+    print(f"\n{summary['throughput']} req/s over {summary['elapsed']}s")
+    for title, rows in (('endpoint', summary['endpoints']), ('stage (server)', summary['stages'])):
+        print(f"\n{title:<26}{'count':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for name, row in rows.items():
+            print(f"{name:<26}{row['count']:>8}{row.get('throughput', ''):>9}{row['p50']:>10}{row['p95']:>10}"
+                  f"{row['p99']:>10}{row['max']:>10}")
+    if summary['errors']:
+        print("\nerrors: " + ", ".join(f"{name}: {count}" for name, count in summary['errors'].items()))
+
+
+def regressions(summary, baseline, max_regression):
+    # p95 of every endpoint and stage that is more than max_regression slower than in the baseline
+    found = []
+    for section in ('endpoints', 'stages'):
+        for name, row in summary[section].items():
+            before = baseline.get(section, {}).get(name)
+            if before and before['p95'] and row['p95'] > before['p95'] * (1 + max_regression):
+                found.append(f"{section[:-1]} {name}: p95 {before['p95']} -> {row['p95']} ms")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--endpoints', nargs='+', default=['prediction'], choices=ENDPOINTS)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=100, help='measured requests (after the warm-up)')
+    parser.add_argument('--warmup', type=int, default=10, help='requests sent before measuring')
+    parser.add_argument('--batch-size', type=int, default=10, help='movies per batch request')
+    parser.add_argument('--unique-titles', action='store_true', help='make every title unique (no embedding cache hits)')
+    parser.add_argument('--llm-cache', action='store_true', help='keep the ChatGPT response cache on')
+    parser.add_argument('--timeout', type=float, default=120.0, help='client timeout per request in seconds')
+    parser.add_argument('--port', type=int, default=8199)
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker')
+    parser.add_argument('--startup-timeout', type=float, default=300.0)
+    add_profile_arguments(parser, 'openai', 800)
+    add_profile_arguments(parser, 'vertex', 60)
+    parser.add_argument('--openai-error-status', type=int, default=429)
+    parser.add_argument('--json', help='write the summary to this file')
+    parser.add_argument('--baseline', help='summary of a previous run to compare with')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='allowed p95 slowdown vs the baseline')
+    args = parser.parse_args()
+
+    openai_server = start_openai(profile=profile_from_args(args, 'openai'), error_status=args.openai_error_status)
+    vertex_server, vertex_port = start_vertex(profile=profile_from_args(args, 'vertex'))
+
+    with tempfile.TemporaryDirectory(prefix='storyzer-loadtest-') as workdir:
+        env = environment(args, workdir, openai_server.server_port, vertex_port)
+        token = prepare_database(env)
+        server = start_server(env, args.port, args.startup_timeout)
+        try:
+            results, elapsed = run(args, args.port, token)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    openai_server.shutdown()
+    vertex_server.stop(None)
+
+    summary = report(results, elapsed)
+    summary["config"] = {key: value for key, value in vars(args).items() if key not in ('json', 'baseline')}
+    print_report(summary)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            found = regressions(summary, json.load(f), args.max_regression)
+        if found:
+            print("\nregressions:\n  " + "\n  ".join(found))
+            sys.exit(1)
+        print("\nno p95 regression against the baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+"""Django settings for benchmarks/loadtest.py: the regular settings read from benchmarks/loadtest.ini,
+on SQLite, with OpenAI and Vertex AI pointed at the local fakes of benchmarks/fakes.py."""
+import os
+
+os.environ.setdefault('STORYZER_CONFIG', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'loadtest.ini'))
+
+from storyzer.settings import *  # noqa: E402,F401,F403
+from storyzer.settings import BASE_DIR, LLM_CACHE_ALIAS  # noqa: E402
+
+DEBUG = False
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('LOADTEST_DB', os.path.join(BASE_DIR, '.cache', 'loadtest.sqlite3')),
+        'OPTIONS': {'timeout': 30}, # several gunicorn workers write to the same file
+    }
+}
+
+OPENAI_API_BASE = os.environ.get('LOADTEST_OPENAI_BASE', 'http://127.0.0.1:8100/v1')
+VERTEX_API_ENDPOINT = os.environ.get('LOADTEST_VERTEX_ENDPOINT', '127.0.0.1:8101')
+VERTEX_INSECURE = True
+
+LLM_CACHE_ENABLED = os.environ.get('LOADTEST_LLM_CACHE') == '1'
+CACHES[LLM_CACHE_ALIAS] = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}  # noqa: F405
+EMBEDDING_WARMUP = os.environ.get('LOADTEST_EMBEDDING_WARMUP', '1') == '1'
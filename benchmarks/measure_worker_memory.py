@@ -0,0 +1,87 @@
+"""Per-worker unique vs shared memory of a running gunicorn server (Linux only).
+
+Reads /proc/<pid>/smaps_rollup of the master and every worker. "unique" is the memory only that
+process holds (Private_Clean + Private_Dirty), "shared" is the memory it shares with other processes
+(Shared_Clean + Shared_Dirty), and PSS splits shared pages evenly, so the PSS total is the real
+footprint of the whole server.
+
+    python benchmarks/measure_worker_memory.py <gunicorn master pid>
+    python benchmarks/measure_worker_memory.py            # finds the gunicorn master itself
+"""
+import argparse
+import os
+import sys
+
+FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def read_memory(pid):
+    # kB values of FIELDS; smaps_rollup needs Linux 4.14+, otherwise every mapping of smaps is summed
+    totals = dict.fromkeys(FIELDS, 0)
+    path = f'/proc/{pid}/smaps_rollup'
+    if not os.path.exists(path):
+        path = f'/proc/{pid}/smaps'
+    with open(path, 'r') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            if name in totals:
+                totals[name] += int(value.split()[0])
+    return totals
+
+
+def children(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children', 'r') as f:
+            return [int(child) for child in f.read().split()]
+    except FileNotFoundError:
+        return [int(entry) for entry in os.listdir('/proc') if entry.isdigit() and parent(int(entry)) == pid]
+
+
+def parent(pid):
+    try:
+        with open(f'/proc/{pid}/stat', 'r') as f:
+            return int(f.read().rsplit(')', 1)[1].split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def command(pid):
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            return f.read().replace(b'\0', b' ').decode(errors='replace').strip()
+    except OSError:
+        return ''
+
+
+def find_master():
+    # gunicorn processes whose parent is not gunicorn
+    pids = [int(entry) for entry in os.listdir('/proc') if entry.isdigit() and 'gunicorn' in command(int(entry))]
+    masters = [pid for pid in pids if parent(pid) not in pids]
+    return masters[0] if masters else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pid', type=int, nargs='?', help='gunicorn master pid')
+    args = parser.parse_args()
+
+    master = args.pid or find_master()
+    if master is None:
+        sys.exit("gunicorn master not found, pass its pid")
+
+    print(f"{'process':<10}{'pid':>8}{'rss MB':>10}{'pss MB':>10}{'unique MB':>12}{'shared MB':>12}")
+    total_pss = total_rss = 0
+    for role, pid in [('master', master)] + [('worker', child) for child in children(master)]:
+        memory = read_memory(pid)
+        unique = memory['Private_Clean'] + memory['Private_Dirty']
+        shared = memory['Shared_Clean'] + memory['Shared_Dirty']
+        total_pss += memory['Pss']
+        total_rss += memory['Rss']
+        print(f"{role:<10}{pid:>8}{memory['Rss'] / 1024:>10.1f}{memory['Pss'] / 1024:>10.1f}"
+              f"{unique / 1024:>12.1f}{shared / 1024:>12.1f}")
+    print(f"total rss {total_rss / 1024:.1f} MB (counts shared pages once per process), "
+          f"total pss {total_pss / 1024:.1f} MB (actual footprint)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# gunicorn -c gunicorn.conf.py
+#
+# STORYZER_ROLE selects the entry point and the default sizing of this server:
+#   all         storyzer.wsgi             every endpoint in one pool (default)
+#   api         storyzer.wsgi_api         users, tokens, stored results: many light workers
+#   prediction  storyzer.wsgi_prediction  prediction and ChatGPT: few workers, embedding model preloaded
+# Run one server per role behind a proxy that routes by URL (see nginx.conf) and size each
+# independently with GUNICORN_WORKERS / GUNICORN_THREADS.
+#
+# ASGI: GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker GUNICORN_WSGI_APP=storyzer.asgi_prediction:application
+# serves the prediction and ChatGPT endpoints with the native async views (storyzerapi/async_views.py);
+# one worker then holds many OpenAI/Vertex AI calls in flight and GUNICORN_THREADS does not apply.
+#
+# With STORYZER_PRELOAD=1 (default) the Django app, and the embedding model when
+# [EMBEDDING] WARMUP = true or in prediction workers, is loaded once in the master and the workers
+# are forked from it, so the model weights are shared copy-on-write instead of loaded once per worker.
+import gc
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+role = os.environ.setdefault('STORYZER_ROLE', 'all')
+
+ROLE_DEFAULTS = {
+    #             wsgi_app                               workers                              threads timeout
+    'all':        ('storyzer.wsgi:application',            4,                                   1,      120),
+    'api':        ('storyzer.wsgi_api:application',        multiprocessing.cpu_count() * 2 + 1, 2,      30),
+    # threads: predictions mostly wait on OpenAI and Vertex AI
+    'prediction': ('storyzer.wsgi_prediction:application', 2,                                   8,      300),
+}
+default_app, default_workers, default_threads, default_timeout = ROLE_DEFAULTS[role]
+
+wsgi_app = os.environ.get('GUNICORN_WSGI_APP', default_app)
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', default_workers))
+threads = int(os.environ.get('GUNICORN_THREADS', default_threads))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', default_timeout))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+
+preload_app = os.environ.setdefault('STORYZER_PRELOAD', '1') == '1'
+
+# Prometheus multiprocess mode: must be set before prometheus_client is imported by the app (preload
+# imports it in the master). Every worker writes its metrics to files here and /metrics sums them up.
+if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+    # first load only, a config reload (HUP) must not drop the samples of running workers
+    # one directory per role, the servers of each role run (and are restarted) separately
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = os.path.join(tempfile.gettempdir(), f'storyzer-prometheus-{role}')
+    shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+
+def when_ready(server):
+    if preload_app:
+        # Move everything loaded so far out of the GC's reach; otherwise the collector
+        # writes to the object headers in every worker and un-shares those pages.
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        # The master only loaded the weights, run the first encode in each worker
+        from storyzerapi.module.embedding import registry, warmup
+        if registry.is_loaded():
+            warmup()
+
+
+def child_exit(server, worker):
+    # Drop the live gauges (in-flight requests) of the dead worker
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
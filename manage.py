@@ -2,37 +2,16 @@
 """Django's command-line utility for administrative tasks."""
 import os
 import sys
-import requests
-
-host = "localhost"
-port = 8000
-
-for arg in sys.argv:
-    if arg.startswith("--noreload"):
-        continue
-    if ":" in arg:
-        host, port = arg.split(":")
-        break
-    
-def get_public_ip():
-    try:
-        return requests.get('https://api.ipify.org').text
-    except requests.ConnectionError:
-        return False
-    except requests.Timeout:
-        return False
-    except Exception as e:
-        print(e)
-        return False
-
-host = get_public_ip() if host == "0.0.0.0" else host
-api_host = f"{host}:{port}" if host else f"localhost:{port}"
 
 def main():
     """Run administrative tasks."""
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'storyzer.settings')
     
-    print(f"API Swagger: http://{api_host}/swagger/")
+    if 'runserver' in sys.argv:
+        # host:port given to runserver, the public IP lookup (for 0.0.0.0) only happens in storyzer.hosts.api_host()
+        from storyzer.hosts import bind_address
+        host, port = bind_address()
+        print(f"API Swagger: http://{host}:{port}/swagger/")
     
     try:
         from django.core.management import execute_from_command_line
@@ -12,5 +12,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'storyzer.settings')
+os.environ['STORYZER_INTERFACE'] = 'asgi' # native async prediction and ChatGPT views (settings.ASYNC_VIEWS)
 
 application = get_asgi_application()
@@ -0,0 +1,13 @@
+"""
+ASGI config of the prediction workers (STORYZER_ROLE=prediction, see storyzer/settings.py and gunicorn.conf.py).
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'storyzer.settings')
+os.environ['STORYZER_INTERFACE'] = 'asgi' # native async prediction and ChatGPT views (settings.ASYNC_VIEWS)
+os.environ['STORYZER_ROLE'] = 'prediction'
+
+application = get_asgi_application()
@@ -0,0 +1,52 @@
+import functools
+import logging
+import re
+import sys
+
+PUBLIC_IP_URL = 'https://api.ipify.org'
+DEFAULT_PORT = '8000'
+
+_ADDRESS = re.compile(r'^(?P<host>[\w.\-\[\]]*):(?P<port>\d+)$')
+
+
+def bind_address(argv=None):
+    # (host, port) of a runserver-style "host:port" argument, localhost:8000 if there is none
+    for arg in (sys.argv if argv is None else argv)[1:]:
+        match = _ADDRESS.match(arg)
+        if match:
+            return match.group('host') or 'localhost', match.group('port')
+    return 'localhost', DEFAULT_PORT
+
+
+def public_ip(timeout=2.0):
+    # None when the lookup fails or takes longer than timeout seconds
+    import requests
+
+    try:
+        response = requests.get(PUBLIC_IP_URL, timeout=timeout)
+        response.raise_for_status()
+        return response.text.strip() or None
+    except requests.RequestException as e:
+        logging.error(f"Public IP lookup failed. error: {str(e)}")
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve(host, port, timeout):
+    if host == '0.0.0.0':
+        host = public_ip(timeout) or 'localhost'
+    return f"{host}:{port}"
+
+
+def api_host():
+    """host:port used in the links of verification/password reset e-mails.
+
+    settings.API_HOST (STORYZER_API_HOST or [SERVER] API_HOST) wins. Otherwise it is the address
+    runserver was started with, where 0.0.0.0 is replaced by the public IP. The lookup runs on the
+    first call only, never at import time, and is bounded by settings.PUBLIC_IP_TIMEOUT."""
+    from django.conf import settings
+
+    if settings.API_HOST:
+        return settings.API_HOST
+    host, port = bind_address()
+    return _resolve(host, port, settings.PUBLIC_IP_TIMEOUT)
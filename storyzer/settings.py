@@ -15,11 +15,10 @@ import json
 import os
 from pathlib import Path
 from configparser import ConfigParser
-from manage import api_host
 
-# Read config.ini file
+# Read config.ini file (STORYZER_CONFIG points to another file, e.g. benchmarks/loadtest.ini)
 config = ConfigParser()
-config.read('config.ini')
+config.read(os.environ.get('STORYZER_CONFIG', 'config.ini'))
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -36,7 +35,22 @@ DEBUG = True
 
 ALLOWED_HOSTS = ["*"]
 
-API_HOST = api_host
+# host:port for links in e-mails. Empty: the runserver address, 0.0.0.0 resolved lazily to the public IP
+# (see storyzer.hosts.api_host)
+API_HOST = os.environ.get('STORYZER_API_HOST') or config.get('SERVER', 'API_HOST', fallback='')
+PUBLIC_IP_TIMEOUT = config.getfloat('SERVER', 'PUBLIC_IP_TIMEOUT', fallback=2.0)
+
+# Worker role, set by the entry point (storyzer/wsgi_api.py, wsgi_prediction.py, asgi_api.py, asgi_prediction.py)
+#   all: every endpoint in one process (default, runserver)
+#   api: users, tokens, stored results, docs and admin, without the prediction stack
+#   prediction: prediction and ChatGPT endpoints only, with the embedding model preloaded
+SERVER_ROLES = ('all', 'api', 'prediction')
+SERVER_ROLE = os.environ.get('STORYZER_ROLE', 'all')
+if SERVER_ROLE not in SERVER_ROLES:
+    raise ValueError(f"STORYZER_ROLE must be one of {', '.join(SERVER_ROLES)}, not '{SERVER_ROLE}'")
+# Set by the ASGI entry points (storyzer/asgi*.py): /movie/prediction, /chatgpt/ and /chatgpt/translate/
+# are served by the native async views of storyzerapi/async_views.py instead of the DRF views
+ASYNC_VIEWS = os.environ.get('STORYZER_INTERFACE') == 'asgi'
 
 # Application definition
 
@@ -53,6 +67,10 @@ INSTALLED_APPS = [
     # 'storyzerapi',
     'storyzerapi.apps.StoryzerapiConfig'
 ]
+# Prediction workers authenticate with JWT only; no admin or session based pages
+PREDICTION_EXCLUDED_APPS = ('django.contrib.admin', 'django.contrib.sessions', 'django.contrib.messages')
+if SERVER_ROLE == 'prediction':
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in PREDICTION_EXCLUDED_APPS]
 
 
 
@@ -68,6 +86,10 @@ REST_FRAMEWORK = {
 with open('keywords.json', 'r', encoding='utf-8') as f:
     SCENARIO_KEYWORDS = json.loads(f.read())
 
+# genre_average.json / movie_result_format.json are cached in memory and re-read when their
+# mtime changes; the mtime is checked at most every REFERENCE_DATA_CHECK_INTERVAL seconds
+REFERENCE_DATA_CHECK_INTERVAL = 5.0
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=7),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=30),
@@ -101,6 +123,8 @@ SIMPLE_JWT = {
 }
 
 MIDDLEWARE = [
+    'storyzerapi.middleware.ServerTimingMiddleware', # first, so the timing covers every other middleware
+    'storyzerapi.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -110,6 +134,12 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware'
 ]
+if SERVER_ROLE == 'prediction':
+    MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in (
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+    )]
 CSRF_TRUSTED_ORIGINS = (
     'http://localhost:8000',
     'http://127.0.0.1:8000',
@@ -170,8 +200,62 @@ EMAIL_HOST_USER = config['EMAIL']['USER']
 EMAIL_HOST_PASSWORD = config['EMAIL']['PASSWORD']
 
 OPENAI_API_KEY = config['OPENAI']['API_KEY']
+# Base URL of the OpenAI API, empty for the openai package default (set to a local fake server for load tests)
+OPENAI_API_BASE = config.get('OPENAI', 'API_BASE', fallback='')
+# OpenAI client (storyzerapi/module/openai_client.py), all limits per worker process
+OPENAI_POOL_SIZE = config.getint('OPENAI', 'POOL_SIZE', fallback=32) # pooled connections of the sync views
+# Connections to OpenAI per worker of the async views (aiohttp), 0 for no limit
+OPENAI_ASYNC_MAX_CONNECTIONS = config.getint('OPENAI', 'ASYNC_MAX_CONNECTIONS', fallback=500)
+OPENAI_CONNECT_TIMEOUT = config.getfloat('OPENAI', 'CONNECT_TIMEOUT', fallback=5.0)
+OPENAI_TIMEOUT = config.getfloat('OPENAI', 'TIMEOUT', fallback=60.0) # per attempt in seconds
+# Whole call including retries and backoff. A prediction makes two OpenAI calls one after the other
+# (translate, analysis), so two deadlines must fit in the 300s worker and proxy timeouts.
+OPENAI_DEADLINE = config.getfloat('OPENAI', 'DEADLINE', fallback=120.0)
+# Retries of rate limited (429), 5xx and failed connections, exponential backoff or Retry-After
+OPENAI_MAX_RETRIES = config.getint('OPENAI', 'MAX_RETRIES', fallback=3)
+OPENAI_BACKOFF_BASE = config.getfloat('OPENAI', 'BACKOFF_BASE', fallback=1.0)
+OPENAI_BACKOFF_MAX = config.getfloat('OPENAI', 'BACKOFF_MAX', fallback=30.0) # a longer Retry-After is not waited for
+# Concurrent calls per model, e.g. "gpt-4:8, gpt-3.5-turbo:32"; other models MAX_CONCURRENCY, 0 for no limit
+OPENAI_MAX_CONCURRENCY = config.getint('OPENAI', 'MAX_CONCURRENCY', fallback=0)
+OPENAI_MODEL_CONCURRENCY = {model.strip(): int(limit) for model, limit in (
+    item.rsplit(':', 1) for item in config.get('OPENAI', 'MODEL_CONCURRENCY', fallback='').split(',') if item.strip())}
+
+# Minimum local English score (0..1) to skip the translate_en ChatGPT call
+TRANSLATION_SKIP_THRESHOLD = config.getfloat('OPENAI', 'TRANSLATION_SKIP_THRESHOLD', fallback=0.6)
+
+# Log token counts of the analysis prompt sections (and of the uncompacted prompt, for comparison).
+# Off by default: it builds and tokenizes the legacy prompt on every prediction.
+PROMPT_TOKEN_LOG = config.getboolean('OPENAI', 'PROMPT_TOKEN_LOG', fallback=False)
+
+# ChatGPT response cache (content addressed by model + messages)
+LLM_CACHE_ENABLED = config.getboolean('LLM_CACHE', 'ENABLED', fallback=True)
+LLM_CACHE_ALIAS = 'llm'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # file or db backend in production so every worker shares the cache, locmem for tests
+    LLM_CACHE_ALIAS: {
+        'BACKEND': config.get('LLM_CACHE', 'BACKEND', fallback='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config.get('LLM_CACHE', 'LOCATION', fallback=os.path.join(BASE_DIR, '.cache', 'llm')),
+        'TIMEOUT': config.getint('LLM_CACHE', 'TTL', fallback=60 * 60 * 24 * 7),
+        'OPTIONS': {
+            'MAX_ENTRIES': config.getint('LLM_CACHE', 'MAX_ENTRIES', fallback=10000),
+        },
+    },
+}
+
+# Per-stage request timing: Server-Timing response header and one JSON log line per request
+SERVER_TIMING = config.getboolean('MONITORING', 'SERVER_TIMING', fallback=True)
+TIMING_LOG = config.getboolean('MONITORING', 'TIMING_LOG', fallback=True)
+# Prometheus /metrics endpoint
+METRICS_ENABLED = config.getboolean('MONITORING', 'METRICS', fallback=True)
 
-ROOT_URLCONF = 'storyzer.urls'
+ROOT_URLCONF = {
+    'api': 'storyzer.urls_api',
+    'prediction': 'storyzer.urls_prediction',
+}.get(SERVER_ROLE, 'storyzer.urls')
 
 TEMPLATES = [
     {
@@ -199,6 +283,48 @@ VOTE_ENDPOINT = config['VERTEX_AI']['VOTE_ENDPOINT']
 REVENUE_ENDPOINT = config['VERTEX_AI']['REVENUE_ENDPOINT']
 CLASSIFICATION_ENDPOINT = config['VERTEX_AI']['CLASSIFICATION_ENDPOINT']
 CREDENTIALS = 'credentials.json'
+VERTEX_API_ENDPOINT = config.get('VERTEX_AI', 'API_ENDPOINT', fallback=f'{LOCATION}-aiplatform.googleapis.com')
+VERTEX_CLIENT_POOL_SIZE = config.getint('VERTEX_AI', 'CLIENT_POOL_SIZE', fallback=2) # gRPC channels per worker
+VERTEX_KEEPALIVE_MS = config.getint('VERTEX_AI', 'KEEPALIVE_MS', fallback=30000)
+VERTEX_INSECURE = config.getboolean('VERTEX_AI', 'INSECURE', fallback=False) # plaintext channel for local fake servers
+VERTEX_TIMEOUT = config.getfloat('VERTEX_AI', 'TIMEOUT', fallback=30.0) # per-call deadline in seconds
+VERTEX_MAX_CONCURRENCY = config.getint('VERTEX_AI', 'MAX_CONCURRENCY', fallback=8) # concurrent calls per worker
+VERTEX_BATCH_SIZE = config.getint('VERTEX_AI', 'BATCH_SIZE', fallback=50) # instances per predict request
+VERTEX_CLIENT_FACTORY = config.get('VERTEX_AI', 'CLIENT_FACTORY', fallback='') # dotted path, default client if empty
+VERTEX_ASYNC_CLIENT_FACTORY = config.get('VERTEX_AI', 'ASYNC_CLIENT_FACTORY', fallback='') # same for the async views
+
+
+# Prediction pipeline: threads per worker that run independent stages concurrently
+PIPELINE_MAX_WORKERS = config.getint('PIPELINE', 'MAX_WORKERS', fallback=16)
+# Asynchronous prediction jobs: a running job without progress for JOB_TIMEOUT seconds is retried
+PREDICTION_JOB_TIMEOUT = config.getint('PIPELINE', 'JOB_TIMEOUT', fallback=600)
+PREDICTION_JOB_MAX_ATTEMPTS = config.getint('PIPELINE', 'JOB_MAX_ATTEMPTS', fallback=2)
+# Batch prediction: maximum movies per request and concurrent ChatGPT calls per batch. A request
+# answered inline must finish within the 300s gunicorn/nginx timeouts (two rounds of
+# BATCH_LLM_CONCURRENCY ChatGPT calls per stage); larger batches go to the job queue (?async=1).
+BATCH_MAX_ITEMS = config.getint('PIPELINE', 'BATCH_MAX_ITEMS', fallback=16)
+BATCH_ASYNC_MAX_ITEMS = config.getint('PIPELINE', 'BATCH_ASYNC_MAX_ITEMS', fallback=500)
+BATCH_LLM_CONCURRENCY = config.getint('PIPELINE', 'BATCH_LLM_CONCURRENCY', fallback=8)
+# Import the prediction views (OpenAI, Vertex AI SDKs) at startup instead of on their first request.
+# STORYZER_PREDICTION_PRELOAD=1 turns it on for designated prediction workers only.
+PREDICTION_PRELOAD = SERVER_ROLE == 'prediction' or os.environ.get('STORYZER_PREDICTION_PRELOAD') == '1' \
+                     or config.getboolean('PIPELINE', 'PRELOAD', fallback=False)
+
+
+# Title embedding model (SentenceTransformer)
+EMBEDDING_MODEL = config.get('EMBEDDING', 'MODEL', fallback='all-mpnet-base-v1')
+EMBEDDING_DEVICE = config.get('EMBEDDING', 'DEVICE', fallback='') or None
+EMBEDDING_BACKEND = config.get('EMBEDDING', 'BACKEND', fallback='torch') # torch, torch-int8 or onnx
+EMBEDDING_ONNX_FILE = config.get('EMBEDDING', 'ONNX_FILE', fallback='') # e.g. onnx/model_qint8_avx512_vnni.onnx
+# safetensors file from export_embedding_weights, memory-mapped read-only and shared by all workers
+EMBEDDING_WEIGHTS_FILE = config.get('EMBEDDING', 'WEIGHTS_FILE', fallback='')
+# Set by gunicorn.conf.py when the app is loaded in the master before forking workers
+PRELOAD_APP = os.environ.get('STORYZER_PRELOAD') == '1'
+# always on in prediction workers, never in api workers
+EMBEDDING_WARMUP = SERVER_ROLE == 'prediction' \
+                   or (SERVER_ROLE == 'all' and config.getboolean('EMBEDDING', 'WARMUP', fallback=False))
+EMBEDDING_CACHE_SIZE = config.getint('EMBEDDING', 'CACHE_SIZE', fallback=1024) # in-memory LRU entries per worker
+EMBEDDING_CACHE_DB = config.getboolean('EMBEDDING', 'CACHE_DB', fallback=True) # persist embeddings in TitleEmbedding
 
 
 # Database
@@ -32,16 +32,26 @@ schema_view = get_schema_view(
     ),
     public=True,
     permission_classes=(permissions.AllowAny,),
+    # every endpoint, also when served by an api worker (which then loads the prediction views for the schema)
+    urlconf='storyzer.urls',
 )
 
-urlpatterns = [
-    path('', include('storyzerapi.urls')),
-    path('admin/', admin.site.urls),
-    path('api/', include('storyzerapi.urls')),
+docs_urlpatterns = [
     re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name="schema-json"),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name="schema-swagger-ui"),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name="schema-redoc"),
+]
+
+token_urlpatterns = [
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'), # 토큰 발급
     path('token/verify/', TokenObtainPairView.as_view(), name='token_obtain_pair'), # 토큰 유효성 검사
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'), # 토큰 갱신
 ]
+
+# Every endpoint in one process (STORYZER_ROLE=all). storyzer.urls_api and storyzer.urls_prediction
+# split them between the two kinds of workers.
+urlpatterns = [
+    path('', include('storyzerapi.urls')),
+    path('admin/', admin.site.urls),
+    path('api/', include('storyzerapi.urls')),
+] + docs_urlpatterns + token_urlpatterns
@@ -0,0 +1,17 @@
+"""
+URL configuration of the api workers (STORYZER_ROLE=api, storyzer.wsgi_api / storyzer.asgi_api):
+users, tokens, stored results, docs and admin. The prediction endpoints are served by
+storyzer.urls_prediction.
+"""
+from django.contrib import admin
+from django.urls import include, path
+
+from storyzerapi.urls import api_urlpatterns, common_urlpatterns
+
+from .urls import docs_urlpatterns, token_urlpatterns
+
+urlpatterns = [
+    path('', include(api_urlpatterns + common_urlpatterns)),
+    path('admin/', admin.site.urls),
+    path('api/', include(api_urlpatterns + common_urlpatterns)),
+] + docs_urlpatterns + token_urlpatterns
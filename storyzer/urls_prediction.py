@@ -0,0 +1,12 @@
+"""
+URL configuration of the prediction workers (STORYZER_ROLE=prediction, storyzer.wsgi_prediction /
+storyzer.asgi_prediction): the movie prediction and ChatGPT endpoints only.
+"""
+from django.urls import include, path
+
+from storyzerapi.urls import common_urlpatterns, prediction_urlpatterns
+
+urlpatterns = [
+    path('', include(prediction_urlpatterns + common_urlpatterns)),
+    path('api/', include(prediction_urlpatterns + common_urlpatterns)),
+]
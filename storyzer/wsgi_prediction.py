@@ -0,0 +1,12 @@
+"""
+WSGI config of the prediction workers (STORYZER_ROLE=prediction, see storyzer/settings.py and gunicorn.conf.py).
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'storyzer.settings')
+os.environ['STORYZER_ROLE'] = 'prediction'
+
+application = get_wsgi_application()
@@ -5,3 +5,17 @@ class StoryzerapiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'storyzerapi'
     label = 'storyzerapi'
+
+    def ready(self):
+        from django.conf import settings
+        from . import signals  # noqa: F401
+
+        if settings.PREDICTION_PRELOAD:
+            from . import prediction_views  # noqa: F401
+            if settings.ASYNC_VIEWS:
+                from . import async_views  # noqa: F401
+
+        # Load the embedding model before the first prediction request
+        if settings.EMBEDDING_WARMUP:
+            from .module.embedding import warmup
+            warmup(encode=not settings.PRELOAD_APP)
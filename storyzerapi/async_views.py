@@ -0,0 +1,141 @@
+import json
+import logging
+import traceback
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .module.chatgpt import ChatGPT
+from .module.jobs import enqueue
+from .module.prediction import arun_movie_prediction, astream_movie_prediction, save_movie_result
+from .module.translation import atranslate_en
+
+# Native async versions of the prediction and ChatGPT views, served by the ASGI entry points
+# (settings.ASYNC_VIEWS). OpenAI and Vertex AI calls are awaited on the event loop, so one worker
+# holds many requests in flight; only the ORM (authentication, saving results, queueing jobs) runs
+# in Django's sync thread through sync_to_async. Same URLs, request bodies and responses as the
+# DRF views of prediction_views.py, which stay the documented (swagger) and WSGI implementation.
+
+
+def _response(data, status=status.HTTP_200_OK):
+    return JsonResponse(data, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _json_body(request):
+    # JSON request body as a dict, None if it is not one
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+async def _authenticated_user(request):
+    # JWT authentication of the DRF views; the user lookup is an ORM query
+    try:
+        result = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except AuthenticationFailed as e:
+        logging.error(f"User is not authenticated. error: {str(e)}")
+        return None
+    return result[0] if result else None
+
+
+class AsyncView(View):
+    http_method_names = ['post', 'options']
+    authenticated = False # JWT required, as @verify_user on the DRF views
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method.lower() == 'post':
+            if self.authenticated:
+                request.user = await _authenticated_user(request)
+                if request.user is None:
+                    return _response({"error": "User is not authenticated"}, status=status.HTTP_401_UNAUTHORIZED)
+            request.data = _json_body(request)
+            if request.data is None:
+                return _response({"error": "Request body must be a JSON object"}, status=status.HTTP_400_BAD_REQUEST)
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class MoviePredictionView(AsyncView):
+    authenticated = True
+
+    async def post(self, request):
+        user_id = request.user.id
+
+        # Asynchronous mode: queue the job for run_prediction_worker and return immediately
+        if request.GET.get('async') in ('1', 'true'):
+            job = await sync_to_async(enqueue)(user_id, request.data)
+            return _response({"job_id": str(job.id), "status": job.status,
+                              "status_url": reverse('movie-prediction-job', args=[job.id])},
+                             status=status.HTTP_202_ACCEPTED)
+
+        run = await arun_movie_prediction(request.data)
+        predictions = run['predict']
+        reply = run['analysis']
+        logging.info(f"Movie prediction finished. total: {run.total:.3f}s, critical_path: {run.critical_path}")
+
+        await sync_to_async(save_movie_result)(user_id, request.data, predictions, reply)
+
+        return _response({"input": request.data,
+                          "output": predictions,
+                          "analyze": reply, "category": "movie"
+                          })
+
+
+class MoviePredictionStreamView(AsyncView):
+    authenticated = True
+
+    async def post(self, request):
+        user_id = request.user.id
+        data = request.data
+
+        async def events():
+            yield ": prediction started\n\n" # sent right away so the client sees the first byte
+            predictions = None
+            try:
+                async for event, value in astream_movie_prediction(data):
+                    if event == 'predictions':
+                        predictions = value
+                        yield _sse_event('prediction', predictions)
+                    elif event == 'analysis':
+                        yield _sse_event('analysis', {"delta": value})
+                    else:
+                        results = await sync_to_async(save_movie_result)(user_id, data, predictions, value)
+                        yield _sse_event('done', {"id": results.id, "input": data, "output": predictions,
+                                                  "analyze": value, "category": "movie"})
+            except Exception as e:
+                logging.error(f"Streaming prediction failed. error: {str(e)}\n{traceback.format_exc()}")
+                yield _sse_event('error', {"error": f"Error occurred while predicting. error: {str(e)}"})
+
+        response = StreamingHttpResponse(events(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no' # disable proxy buffering (nginx)
+        return response
+
+
+class ChatGPTView(AsyncView):
+    async def post(self, request):
+        system_prompt = request.data.get('system_prompt')
+        user_prompt = request.data.get('user_prompt')
+
+        reply = await ChatGPT(user_prompt, system_prompt, model="gpt-3.5-turbo").achatgpt_request()
+
+        return _response({"message": reply})
+
+
+class ChatGPTTranslateView(AsyncView):
+    authenticated = True
+
+    async def post(self, request):
+        reply = await atranslate_en(request.data.get('context'))
+
+        return _response({"message": reply})
@@ -0,0 +1,53 @@
+import threading
+
+from asgiref.sync import markcoroutinefunction
+from django.utils.module_loading import import_string
+
+
+class LazyView():
+    """URLconf entry for a class-based view whose module is imported on the first request.
+
+    Lets urls.py route to storyzerapi.prediction_views without importing the prediction stack
+    when the URLconf is loaded. drf_yasg reads cls/initkwargs, which loads the view as well."""
+    csrf_exempt = True # as APIView.as_view(), DRF enforces CSRF for session authentication itself
+
+    def __init__(self, view_path, **initkwargs):
+        self.view_path = view_path
+        self._initkwargs = initkwargs
+        self._view = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._view is None:
+            with self._lock:
+                if self._view is None:
+                    self._view = import_string(self.view_path).as_view(**self._initkwargs)
+        return self._view
+
+    def __call__(self, request, *args, **kwargs):
+        return self.load()(request, *args, **kwargs)
+
+    @property
+    def cls(self):
+        return self.load().cls
+
+    @property
+    def initkwargs(self):
+        return self.load().initkwargs
+
+    def __repr__(self):
+        return f"LazyView({self.view_path!r})"
+
+
+class AsyncLazyView(LazyView):
+    """LazyView of a view with async handlers (storyzerapi.async_views). Marked as a coroutine function,
+    so Django's ASGI handler awaits it on the event loop instead of running it in a thread."""
+    def __init__(self, view_path, **initkwargs):
+        super().__init__(view_path, **initkwargs)
+        markcoroutinefunction(self)
+
+    async def __call__(self, request, *args, **kwargs):
+        return await self.load()(request, *args, **kwargs)
+
+    def __repr__(self):
+        return f"AsyncLazyView({self.view_path!r})"
@@ -0,0 +1,19 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from storyzerapi.module.embedding import export_weights, load_model
+
+
+class Command(BaseCommand):
+    help = "Export the title embedding model weights to a safetensors file for [EMBEDDING] WEIGHTS_FILE"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Output .safetensors file')
+        parser.add_argument('--model', default=None, help=f"Model name (default: {settings.EMBEDDING_MODEL})")
+
+    def handle(self, *args, **options):
+        model = load_model(options['model'] or settings.EMBEDDING_MODEL, device='cpu')
+        export_weights(model, options['path'])
+        self.stdout.write(f"Exported {options['path']} ({os.path.getsize(options['path']) / 2**20:.1f} MB)")
@@ -0,0 +1,20 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from storyzerapi.module.prediction import movie_pipeline
+
+
+class Command(BaseCommand):
+    help = "Print the stage dependency graph of the movie prediction pipeline"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--durations', default=None,
+                            help='JSON object of stage durations in seconds to compute the critical path, '
+                                 'e.g. \'{"translate": 2.1, "analysis": 15}\'')
+
+    def handle(self, *args, **options):
+        self.stdout.write(json.dumps(movie_pipeline.graph(), indent=4))
+        if options['durations']:
+            durations = json.loads(options['durations'])
+            self.stdout.write(f"critical path: {' -> '.join(movie_pipeline.critical_path(durations))}")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from storyzerapi.module.genre_stats import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-genre prediction statistics from all stored Results in a single streaming pass"
+
+    def handle(self, *args, **options):
+        processed = rebuild()
+        self.stdout.write(f"Genre statistics rebuilt from {processed} results.")
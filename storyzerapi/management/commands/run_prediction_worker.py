@@ -0,0 +1,38 @@
+import logging
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from storyzerapi.module.jobs import work
+
+
+class Command(BaseCommand):
+    help = "Run queued asynchronous movie prediction jobs (POST /movie/prediction?async=1)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help='Jobs processed in parallel by this process')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+
+    def handle(self, *args, **options):
+        stop_event = threading.Event()
+
+        def stop(signum, frame):
+            logging.info("Prediction worker stopping after the current jobs.")
+            stop_event.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        threads = [threading.Thread(target=work, name=f"job-{i}",
+                                    kwargs={'poll_interval': options['poll_interval'], 'once': options['once'],
+                                            'stop_event': stop_event})
+                   for i in range(max(options['concurrency'], 1))]
+        for thread in threads:
+            thread.start()
+        logging.info(f"Prediction worker started. concurrency: {len(threads)}")
+        # join with a timeout so signals are still delivered to the main thread
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1.0)
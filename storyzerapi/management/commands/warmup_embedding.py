@@ -0,0 +1,20 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from storyzerapi.module.embedding import BACKENDS, warmup
+
+
+class Command(BaseCommand):
+    help = "Load the title embedding model once so its weights are downloaded and cached"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', default=None, help=f"Model name (default: {settings.EMBEDDING_MODEL})")
+        parser.add_argument('--device', default=None, help="Device to load the model on, e.g. cpu or cuda")
+        parser.add_argument('--backend', default=None, choices=BACKENDS,
+                            help=f"Inference backend (default: {settings.EMBEDDING_BACKEND})")
+
+    def handle(self, *args, **options):
+        stats = warmup(options['model'], options['device'], options['backend'])
+        self.stdout.write(json.dumps(stats, indent=4))
@@ -0,0 +1,104 @@
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.urls import resolve, Resolver404
+
+from .module import metrics
+from .module.timing import current_trace, end_trace, start_trace
+
+
+class _HybridMiddleware():
+    # Sync and async capable: under ASGI a sync-only middleware would run every request through
+    # Django's single sync thread and serialize the async views behind it
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.ahandle(request)
+        return self.handle(request)
+
+
+def _route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+    return match.url_name
+
+
+class ServerTimingMiddleware(_HybridMiddleware):
+    """Collects the spans recorded while handling a request and emits them as a Server-Timing
+    header and one JSON log line (latency histograms are MetricsMiddleware's).
+
+    Streaming responses get no header because their stages run after the headers are sent."""
+    def handle(self, request):
+        trace, token = start_trace()
+        try:
+            response = self.get_response(request)
+        finally:
+            end_trace(token)
+        return self.finish(request, response, trace)
+
+    async def ahandle(self, request):
+        trace, token = start_trace()
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_trace(token)
+        return self.finish(request, response, trace)
+
+    def finish(self, request, response, trace):
+        total = trace.elapsed()
+        if settings.SERVER_TIMING and not response.streaming:
+            response['Server-Timing'] = trace.server_timing(total=total)
+        if settings.TIMING_LOG and trace.spans:
+            logging.info(json.dumps({
+                "event": "request_timing",
+                "method": request.method,
+                "path": request.path,
+                "route": _route_name(request),
+                "status": response.status_code,
+                "total_ms": round(total * 1000, 1),
+                "db_queries": trace.db_queries,
+                "spans": trace.as_list(),
+            }, ensure_ascii=False))
+        return response
+
+
+class MetricsMiddleware(_HybridMiddleware):
+    """Prometheus request count/latency per url name, DB queries per request and the in-flight gauge.
+    Placed after ServerTimingMiddleware so the request trace (and its query count) already exists."""
+    def handle(self, request):
+        started = time.perf_counter()
+        metrics.IN_FLIGHT.inc()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.IN_FLIGHT.dec()
+        return self.finish(request, response, started)
+
+    async def ahandle(self, request):
+        started = time.perf_counter()
+        metrics.IN_FLIGHT.inc()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.IN_FLIGHT.dec()
+        return self.finish(request, response, started)
+
+    def finish(self, request, response, started):
+        trace = current_trace()
+        metrics.observe_request(_route_name(request) or 'unmatched', request.method, response.status_code,
+                                time.perf_counter() - started, trace.db_queries if trace else None)
+        return response
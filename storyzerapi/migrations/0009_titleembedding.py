@@ -0,0 +1,29 @@
+# Generated by Django 4.2.4 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storyzerapi', '0008_results_analyze_results_input_alter_results_output'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=100)),
+                ('title_hash', models.CharField(max_length=64)),
+                ('title', models.TextField()),
+                ('dim', models.PositiveIntegerField()),
+                ('vector', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='titleembedding',
+            constraint=models.UniqueConstraint(fields=('model_name', 'title_hash'), name='unique_title_embedding'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.4 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storyzerapi', '0010_predictionjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='results',
+            name='category',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='results',
+            index=models.Index(fields=['user', 'category', 'created_at'], name='results_user_category_created'),
+        ),
+    ]
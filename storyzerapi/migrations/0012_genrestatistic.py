@@ -0,0 +1,32 @@
+# Generated by Django 4.2.4 on 2026-10-18 12:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storyzerapi', '0011_alter_results_category_results_user_category_created'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenreStatistic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('genre', models.CharField(max_length=50)),
+                ('metric', models.CharField(max_length=20)),
+                ('count', models.BigIntegerField(default=0)),
+                ('mean', models.FloatField(default=0.0)),
+                ('m2', models.FloatField(default=0.0)),
+                ('minimum', models.FloatField(blank=True, null=True)),
+                ('maximum', models.FloatField(blank=True, null=True)),
+                ('sketch', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='genrestatistic',
+            constraint=models.UniqueConstraint(fields=('genre', 'metric'), name='unique_genre_statistic'),
+        ),
+    ]
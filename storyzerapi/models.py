@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import PermissionsMixin
 from django.contrib.auth.base_user import AbstractBaseUser, BaseUserManager
@@ -63,7 +65,75 @@ class Results(models.Model):
     input = models.JSONField(default=dict)
     output = models.JSONField(default=dict)
     analyze = models.TextField(null=True, blank=True)
-    category = models.TextField(null=True, blank=True, max_length=50)
+    category = models.CharField(null=True, blank=True, max_length=50) # CharField so MySQL can index it
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'category', 'created_at'], name='results_user_category_created'),
+        ]
+
+class TitleEmbedding(models.Model):
+    # Persistent tier of the title embedding cache. vector holds float32 bytes of length dim.
+    model_name = models.CharField(max_length=100)
+    title_hash = models.CharField(max_length=64)
+    title = models.TextField()
+    dim = models.PositiveIntegerField()
+    vector = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['model_name', 'title_hash'], name='unique_title_embedding'),
+        ]
+
+
+class PredictionJob(models.Model):
+    # DB-backed queue for asynchronous /movie/prediction requests, consumed by run_prediction_worker
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    input = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    stage = models.CharField(max_length=200, null=True, blank=True)
+    result = models.ForeignKey(Results, null=True, blank=True, on_delete=models.SET_NULL)
+    error = models.TextField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    worker = models.CharField(max_length=100, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='predictionjob_status_created'),
+        ]
+
+class GenreStatistic(models.Model):
+    # Running statistics of predicted metrics per genre, see module/genre_stats.py
+    genre = models.CharField(max_length=50)
+    metric = models.CharField(max_length=20)
+    count = models.BigIntegerField(default=0)
+    mean = models.FloatField(default=0.0)
+    m2 = models.FloatField(default=0.0) # sum of squared differences from the mean (Welford)
+    minimum = models.FloatField(null=True, blank=True)
+    maximum = models.FloatField(null=True, blank=True)
+    sketch = models.JSONField(default=dict) # P² median markers
     updated_at = models.DateTimeField(auto_now=True)
-    
\ No newline at end of file
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['genre', 'metric'], name='unique_genre_statistic'),
+        ]
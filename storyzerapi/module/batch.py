@@ -0,0 +1,143 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from ..models import Results
+from .embedding_cache import get_title_embeddings
+from .features import encode_instance, encode_instances
+from .genre_stats import record_results
+from .prediction import DEFAULT_RESULT_USER_ID, analysis, movie_inputs, translate
+from .timing import span
+from .vertex import classify_scenario_types, predict_potentials
+
+# Batch movie prediction: the same stages as movie_pipeline, but every stage handles the whole
+# slate at once. Titles go through one encode call, Vertex gets multi-instance requests and
+# ChatGPT calls run on a pool bounded by BATCH_LLM_CONCURRENCY. A failing item is reported with
+# the stage it failed in and does not stop the others. The GPT-4 scenario check is skipped
+# because its reply is not used by any later stage.
+
+
+class BatchItem():
+    def __init__(self, index, data):
+        self.index = index
+        self.data = data
+        self.inputs = movie_inputs(data)
+        self.outputs = {}
+        self.failed_stage = None
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def context(self):
+        return dict(self.inputs, **self.outputs)
+
+    def fail(self, stage, error):
+        if self.ok:
+            logging.error(f"Batch prediction item failed. index: {self.index}, stage: {stage}, error: {str(error)}")
+            self.failed_stage = stage
+            self.error = str(error)
+
+    def to_dict(self):
+        if not self.ok:
+            return {"index": self.index, "status": "failed", "stage": self.failed_stage, "error": self.error,
+                    "input": self.data}
+        return {"index": self.index, "status": "succeeded", "input": self.data,
+                "output": self.outputs['predict'], "analyze": self.outputs['analysis'], "category": "movie"}
+
+
+def _ok(items):
+    return [item for item in items if item.ok]
+
+
+def _collect(stage, futures):
+    for item, future in futures:
+        try:
+            item.outputs[stage] = future.result()
+        except Exception as e:
+            item.fail(stage, e)
+
+
+def _set_results(stage, items, results):
+    for item, result in zip(items, results):
+        if isinstance(result, Exception):
+            item.fail(stage, result)
+        else:
+            item.outputs[stage] = result
+
+
+def _embed_and_encode(items):
+    try:
+        embeddings = get_title_embeddings([item.inputs['title'] for item in items])
+    except Exception as e:
+        for item in items:
+            item.fail('embed_title', e)
+        return
+    _set_results('embed_title', items, embeddings)
+
+    items = _ok(items)
+    try:
+        instances = encode_instances([item.outputs['embed_title'] for item in items],
+                                     [item.inputs['budget'] for item in items],
+                                     [item.inputs['language'] for item in items],
+                                     [item.inputs['runtime'] for item in items],
+                                     [item.inputs['genres'] for item in items])
+        _set_results('features', items, instances)
+    except Exception:
+        # find the offending rows
+        for item in items:
+            try:
+                item.outputs['features'] = encode_instance(item.outputs['embed_title'], item.inputs['budget'],
+                                                           item.inputs['language'], item.inputs['runtime'],
+                                                           item.inputs['genres'])
+            except Exception as e:
+                item.fail('features', e)
+
+
+def predict_movies(data_list):
+    items = [BatchItem(index, data) for index, data in enumerate(data_list)]
+
+    with ThreadPoolExecutor(max_workers=settings.BATCH_LLM_CONCURRENCY, thread_name_prefix='batch-llm') as llm:
+        # translations run on the LLM pool while the titles are embedded
+        translations = [(item, llm.submit(translate, item.context())) for item in items]
+        with span("batch_embed_title"):
+            _embed_and_encode(items)
+        with span("batch_translate"):
+            _collect('translate', translations)
+
+        ready = _ok(items)
+        if ready:
+            with span("batch_classify_scenario"):
+                _set_results('classify_scenario', ready,
+                             classify_scenario_types([item.outputs['translate'] for item in ready]))
+
+        ready = _ok(items)
+        if ready:
+            with span("batch_predict"):
+                _set_results('predict', ready,
+                             predict_potentials([item.outputs['classify_scenario'] for item in ready],
+                                                [item.outputs['features'] for item in ready]))
+
+        with span("batch_analysis"):
+            _collect('analysis', [(item, llm.submit(analysis, item.context())) for item in _ok(items)])
+
+    return items
+
+
+def save_movie_results(user_id, items):
+    # bulk insert of every succeeded item
+    with span("db_write"):
+        results = Results.objects.bulk_create([
+            Results(user_id=user_id if user_id is not None else DEFAULT_RESULT_USER_ID, input=item.data,
+                    output=item.outputs['predict'], analyze=item.outputs['analysis'], category="movie")
+            for item in _ok(items)
+        ])
+    # bulk_create does not send post_save, update the genre statistics directly
+    try:
+        record_results(results)
+    except Exception as e:
+        logging.error(f"Failed to update genre statistics. error: {str(e)}")
+    logging.info(f"Batch predictions saved. user_id: {user_id}, count: {len(results)}")
+    return results
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .metrics import count_cache
+from .openai_client import client
+from .timing import span
+
+_cache_stats = {"hits": 0, "misses": 0}
+_cache_stats_lock = threading.Lock()
+
+
+def _count_cache(result):
+    with _cache_stats_lock:
+        _cache_stats[result] += 1
+    count_cache("llm", "hit" if result == "hits" else "miss")
+
+
+def llm_cache_stats():
+    with _cache_stats_lock:
+        lookups = _cache_stats["hits"] + _cache_stats["misses"]
+        return dict(_cache_stats, hit_ratio=round(_cache_stats["hits"] / lookups, 4) if lookups else 0.0)
+
+
+class ChatGPT():
+    # def __init__(self, user_prompt, system_prompt, model="gpt-3.5-turbo"):
+    def __init__(self, user_prompt, system_prompt, model="gpt-4", use_cache=True):
+        self.user_prompt = user_prompt
+        self.system_prompt = system_prompt
+        self.model = model
+        self.use_cache = use_cache and settings.LLM_CACHE_ENABLED
+        self.messages = []
+        self.messages.append({"role": "system", "content": self.system_prompt})
+
+    def cache_key(self):
+        # Content address of the request: identical model + messages always map to the same key
+        payload = json.dumps({"model": self.model, "messages": self.messages}, sort_keys=True, ensure_ascii=False)
+        return "chatgpt:" + hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _cache_get(self, key):
+        try:
+            return caches[settings.LLM_CACHE_ALIAS].get(key)
+        except Exception as e:
+            logging.error(f"LLM cache read failed. error: {str(e)}")
+            return None
+
+    def _cache_set(self, key, reply):
+        try:
+            caches[settings.LLM_CACHE_ALIAS].set(key, reply)
+        except Exception as e:
+            logging.error(f"LLM cache write failed. error: {str(e)}")
+
+    async def _acache_get(self, key):
+        try:
+            return await caches[settings.LLM_CACHE_ALIAS].aget(key)
+        except Exception as e:
+            logging.error(f"LLM cache read failed. error: {str(e)}")
+            return None
+
+    async def _acache_set(self, key, reply):
+        try:
+            await caches[settings.LLM_CACHE_ALIAS].aset(key, reply)
+        except Exception as e:
+            logging.error(f"LLM cache write failed. error: {str(e)}")
+        
+    def chatgpt_request(self):
+        # Generate chat response
+        self.messages.append({"role": "user", "content": self.user_prompt})
+
+        key = self.cache_key() if self.use_cache else None
+        if key is not None:
+            with span("llm_cache"):
+                reply = self._cache_get(key)
+            _count_cache("hits" if reply is not None else "misses")
+            if reply is not None:
+                self.messages.append({"role": "assistant", "content": reply})
+                return reply
+
+        with span(f"openai.{self.model}"):
+            response = client.chat_completion(self.model, self.messages)
+        
+        reply = response.choices[0].message.content
+        self.messages.append({"role": "assistant", "content": reply})
+
+        if key is not None:
+            self._cache_set(key, reply)
+        
+        return reply
+
+    def chatgpt_stream(self):
+        # Same as chatgpt_request but yields the reply in pieces as OpenAI generates it
+        self.messages.append({"role": "user", "content": self.user_prompt})
+
+        key = self.cache_key() if self.use_cache else None
+        if key is not None:
+            with span("llm_cache"):
+                reply = self._cache_get(key)
+            _count_cache("hits" if reply is not None else "misses")
+            if reply is not None:
+                self.messages.append({"role": "assistant", "content": reply})
+                yield reply
+                return
+
+        # the span covers the whole stream, until the last chunk arrives
+        with span(f"openai_stream.{self.model}"):
+            chunks = []
+            for chunk in client.chat_completion_stream(self.model, self.messages):
+                delta = chunk.choices[0].delta.get("content")
+                if delta:
+                    chunks.append(delta)
+                    yield delta
+
+        reply = "".join(chunks)
+        self.messages.append({"role": "assistant", "content": reply})
+
+        if key is not None:
+            self._cache_set(key, reply)
+
+    async def achatgpt_request(self):
+        # chatgpt_request for the async views: the OpenAI call does not hold a thread while it waits
+        self.messages.append({"role": "user", "content": self.user_prompt})
+
+        key = self.cache_key() if self.use_cache else None
+        if key is not None:
+            with span("llm_cache"):
+                reply = await self._acache_get(key)
+            _count_cache("hits" if reply is not None else "misses")
+            if reply is not None:
+                self.messages.append({"role": "assistant", "content": reply})
+                return reply
+
+        with span(f"openai.{self.model}"):
+            response = await client.achat_completion(self.model, self.messages)
+
+        reply = response.choices[0].message.content
+        self.messages.append({"role": "assistant", "content": reply})
+
+        if key is not None:
+            await self._acache_set(key, reply)
+
+        return reply
+
+    async def achatgpt_stream(self):
+        # chatgpt_stream for the async views
+        self.messages.append({"role": "user", "content": self.user_prompt})
+
+        key = self.cache_key() if self.use_cache else None
+        if key is not None:
+            with span("llm_cache"):
+                reply = await self._acache_get(key)
+            _count_cache("hits" if reply is not None else "misses")
+            if reply is not None:
+                self.messages.append({"role": "assistant", "content": reply})
+                yield reply
+                return
+
+        with span(f"openai_stream.{self.model}"):
+            chunks = []
+            async for chunk in client.achat_completion_stream(self.model, self.messages):
+                delta = chunk.choices[0].delta.get("content")
+                if delta:
+                    chunks.append(delta)
+                    yield delta
+
+        reply = "".join(chunks)
+        self.messages.append({"role": "assistant", "content": reply})
+
+        if key is not None:
+            await self._acache_set(key, reply)
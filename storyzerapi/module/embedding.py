@@ -0,0 +1,188 @@
+import json
+import logging
+import mmap
+import os
+import resource
+import struct
+import threading
+import time
+import warnings
+
+from django.conf import settings
+
+from .metrics import observe_embedding_load
+
+
+def _current_rss_bytes():
+    # /proc is only available on Linux, fall back to the peak RSS elsewhere
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+BACKENDS = ('torch', 'torch-int8', 'onnx')
+
+SAFETENSORS_DTYPES = {
+    'F64': 'float64', 'F32': 'float32', 'F16': 'float16', 'BF16': 'bfloat16',
+    'I64': 'int64', 'I32': 'int32', 'I16': 'int16', 'I8': 'int8', 'U8': 'uint8', 'BOOL': 'bool',
+}
+
+
+def mmap_state_dict(path):
+    """Tensors of a safetensors file backed by a read-only memory map of the file.
+
+    The pages come from the OS page cache, so every worker process that maps the same file
+    shares one physical copy of the weights (with or without preload_app)."""
+    import torch
+
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    header_size = struct.unpack('<Q', buffer[:8])[0]
+    header = json.loads(buffer[8:8 + header_size])
+    data_start = 8 + header_size
+
+    state_dict = {}
+    with warnings.catch_warnings():
+        # the buffer is intentionally not writable
+        warnings.simplefilter('ignore', UserWarning)
+        for name, info in header.items():
+            if name == '__metadata__':
+                continue
+            dtype = getattr(torch, SAFETENSORS_DTYPES[info['dtype']])
+            begin, end = info['data_offsets']
+            count = (end - begin) // torch.empty((), dtype=dtype).element_size()
+            tensor = torch.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + begin) if count \
+                     else torch.empty(0, dtype=dtype)
+            state_dict[name] = tensor.reshape(info['shape'])
+    return state_dict
+
+
+def export_weights(model, path):
+    # Write the model's state dict in the format mmap_state_dict reads
+    from safetensors.torch import save_file
+
+    save_file({name: tensor.detach().contiguous().cpu() for name, tensor in model.state_dict().items()}, path)
+
+
+def load_model(model_name, device=None, backend='torch', onnx_file=None, weights_file=None):
+    """Load a SentenceTransformer with the given inference backend. Every backend exposes the
+    same encode() interface.
+
+    torch: full precision PyTorch. weights_file points to a safetensors export of the model
+           (export_embedding_weights) whose tensors are memory-mapped read-only.
+    torch-int8: PyTorch with dynamically int8-quantized Linear layers (CPU only).
+    onnx: ONNX Runtime (needs sentence-transformers[onnx]); onnx_file selects an exported or
+          quantized file inside the model repository, e.g. onnx/model_qint8_avx512_vnni.onnx.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    if backend == 'torch':
+        model = SentenceTransformer(model_name, device=device)
+        if weights_file:
+            # swap the private copy of the weights for the shared read-only mapping (CPU only)
+            model.load_state_dict(mmap_state_dict(weights_file), assign=True)
+            model.eval()
+        return model
+    if backend == 'torch-int8':
+        import torch
+        model = SentenceTransformer(model_name, device='cpu')
+        model.eval()
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    if backend == 'onnx':
+        model_kwargs = {'file_name': onnx_file} if onnx_file else None
+        return SentenceTransformer(model_name, device=device, backend='onnx', model_kwargs=model_kwargs)
+    raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+
+
+def embedding_model_key(model_name=None, backend=None):
+    # Backends give slightly different vectors, so cached embeddings are kept apart per backend
+    model_name = model_name or settings.EMBEDDING_MODEL
+    backend = backend or settings.EMBEDDING_BACKEND
+    return model_name if backend == 'torch' else f"{model_name}:{backend}"
+
+
+class EmbeddingModelRegistry():
+    """Process-wide registry of SentenceTransformer models keyed by (model name, device, backend).
+
+    Each model is loaded at most once per worker process. Loading happens lazily on first
+    use (or eagerly through warmup) and is guarded by a per-key lock so concurrent requests
+    wait for the same load instead of loading the weights twice.
+    """
+    def __init__(self):
+        self._models = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def _key(self, model_name=None, device=None, backend=None):
+        return (model_name or settings.EMBEDDING_MODEL, device or settings.EMBEDDING_DEVICE,
+                backend or settings.EMBEDDING_BACKEND)
+
+    def get(self, model_name=None, device=None, backend=None):
+        key = self._key(model_name, device, backend)
+
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            model = self._models.get(key)
+            if model is None:
+                model = self._load(*key)
+                self._models[key] = model
+        return model
+
+    def _load(self, model_name, device, backend):
+        rss_before = _current_rss_bytes()
+        started = time.perf_counter()
+        model = load_model(model_name, device, backend, settings.EMBEDDING_ONNX_FILE or None,
+                           settings.EMBEDDING_WEIGHTS_FILE or None)
+        load_seconds = time.perf_counter() - started
+        rss_after = _current_rss_bytes()
+
+        param_bytes = sum(p.numel() * p.element_size() for p in model.parameters())
+        stat = self._stats[(model_name, device, backend)] = {
+            "model": model_name,
+            "device": str(model.device),
+            "backend": backend,
+            "load_seconds": round(load_seconds, 3),
+            "rss_delta_bytes": max(rss_after - rss_before, 0),
+            "param_bytes": param_bytes,
+            "loaded_at": time.time(),
+        }
+        observe_embedding_load(stat)
+        logging.info(f"Embedding model loaded. model: {model_name}, device: {model.device}, backend: {backend}, "
+                     f"load_seconds: {load_seconds:.3f}, param_bytes: {param_bytes}")
+        return model
+
+    def is_loaded(self, model_name=None, device=None, backend=None):
+        return self._key(model_name, device, backend) in self._models
+
+    def stats(self):
+        return [dict(stat) for stat in self._stats.values()]
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._stats.clear()
+            self._key_locks.clear()
+
+
+registry = EmbeddingModelRegistry()
+
+
+def get_embedding_model(model_name=None, device=None, backend=None):
+    return registry.get(model_name, device, backend)
+
+
+def warmup(model_name=None, device=None, backend=None, encode=True):
+    # Load the model and run one encode so lazy torch initialisation happens before the first request.
+    # A gunicorn master that preloads the app must not encode: torch's thread pools don't survive fork.
+    model = registry.get(model_name, device, backend)
+    if encode:
+        model.encode("warmup")
+    return registry.stats()
@@ -0,0 +1,152 @@
+import hashlib
+import logging
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from .embedding import embedding_model_key, get_embedding_model
+from .metrics import count_cache
+
+
+def normalize_title(title):
+    title = unicodedata.normalize('NFKC', str(title))
+    return re.sub(r'\s+', ' ', title).strip()
+
+
+def _title_hash(title):
+    return hashlib.sha256(title.encode('utf-8')).hexdigest()
+
+
+class TitleEmbeddingCache():
+    """Title embeddings keyed by (model name and backend, normalized title).
+
+    Lookups go through a bounded in-memory LRU first, then the TitleEmbedding table,
+    and only call the transformer when both miss.
+    """
+    def __init__(self, max_size=None, use_db=None):
+        self.max_size = settings.EMBEDDING_CACHE_SIZE if max_size is None else max_size
+        self.use_db = settings.EMBEDDING_CACHE_DB if use_db is None else use_db
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def get(self, title, model_name=None):
+        return self.get_many([title], model_name)[0]
+
+    def get_many(self, titles, model_name=None):
+        """Embeddings for a list of titles. Titles missing from both tiers are encoded
+        together in a single model.encode call."""
+        cache_name = embedding_model_key(model_name)
+        titles = [normalize_title(title) for title in titles]
+        found = {}
+
+        for title in dict.fromkeys(titles):
+            embedding = self._get_memory((cache_name, title))
+            if embedding is not None:
+                found[title] = embedding
+
+        missing = [title for title in dict.fromkeys(titles) if title not in found]
+        if missing and self.use_db:
+            stored = self._get_db(cache_name, missing)
+            with self._lock:
+                self.db_hits += len(stored)
+            count_cache("embedding", "db_hit", len(stored))
+            for title, embedding in stored.items():
+                embedding.flags.writeable = False
+                found[title] = embedding
+                self._set_memory((cache_name, title), embedding)
+            missing = [title for title in missing if title not in found]
+
+        if missing:
+            with self._lock:
+                self.misses += len(missing)
+            count_cache("embedding", "miss", len(missing))
+            encoded = np.asarray(get_embedding_model(model_name).encode(missing), dtype=np.float32)
+            if self.use_db:
+                self._set_db(cache_name, missing, encoded)
+            for title, embedding in zip(missing, encoded):
+                embedding = embedding.copy()
+                embedding.flags.writeable = False
+                found[title] = embedding
+                self._set_memory((cache_name, title), embedding)
+
+        return [found[title] for title in titles]
+
+    def _get_memory(self, key):
+        with self._lock:
+            embedding = self._memory.get(key)
+            if embedding is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+        if embedding is not None:
+            count_cache("embedding", "memory_hit")
+        return embedding
+
+    def _set_memory(self, key, embedding):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._memory[key] = embedding
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_size:
+                self._memory.popitem(last=False)
+
+    def _get_db(self, model_name, titles):
+        from ..models import TitleEmbedding
+
+        hashes = {_title_hash(title): title for title in titles}
+        try:
+            rows = TitleEmbedding.objects.filter(model_name=model_name, title_hash__in=list(hashes)) \
+                                         .only('title_hash', 'dim', 'vector')
+            return {hashes[row.title_hash]: np.frombuffer(bytes(row.vector), dtype=np.float32, count=row.dim)
+                    for row in rows}
+        except Exception as e:
+            # treated as misses, the titles are encoded by the model instead
+            logging.warning(f"Failed to read title embeddings. error: {str(e)}")
+            return {}
+
+    def _set_db(self, model_name, titles, embeddings):
+        from ..models import TitleEmbedding
+
+        try:
+            # ignore_conflicts: another worker may have stored the same title in the meantime
+            TitleEmbedding.objects.bulk_create([
+                TitleEmbedding(model_name=model_name, title_hash=_title_hash(title), title=title,
+                               dim=embedding.shape[0], vector=embedding.tobytes())
+                for title, embedding in zip(titles, embeddings)
+            ], ignore_conflicts=True)
+        except Exception as e:
+            logging.error(f"Failed to store title embeddings. error: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            return {
+                "size": len(self._memory),
+                "max_size": self.max_size,
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.memory_hits + self.db_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+
+
+title_embedding_cache = TitleEmbeddingCache()
+
+
+def get_title_embedding(title, model_name=None):
+    return title_embedding_cache.get(title, model_name)
+
+
+def get_title_embeddings(titles, model_name=None):
+    return title_embedding_cache.get_many(titles, model_name)
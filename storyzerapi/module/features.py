@@ -0,0 +1,57 @@
+import logging
+
+import numpy as np
+
+# Fixed schema of the Vertex AI revenue / vote average models
+GENRES = ['Action', 'Adventure', 'Animation', 'Comedy', 'Crime',
+          'Documentary', 'Drama', 'Family', 'Fantasy',
+          'History', 'Horror', 'Music', 'Mystery',
+          'Romance', 'Science_Fiction', 'TV_Movie',
+          'Thriller', 'War', 'Western']
+GENRE_INDEX = {genre: i for i, genre in enumerate(GENRES)}
+GENRE_COLUMNS = ['genre_' + genre for genre in GENRES]
+COLUMNS = ['title_embed', 'budget', 'original_language', 'runtime'] + GENRE_COLUMNS
+
+
+def genre_index(genre):
+    # "Science Fiction" and "TV Movie" are sent with spaces, the columns use underscores
+    return GENRE_INDEX.get(str(genre).strip().replace(' ', '_'))
+
+
+def one_hot_genres(genres_list):
+    """(N, len(GENRES)) uint8 matrix for N lists of genre names. Unknown genres are ignored."""
+    one_hot = np.zeros((len(genres_list), len(GENRES)), dtype=np.uint8)
+    for row, genres in enumerate(genres_list):
+        for genre in genres or []:
+            index = genre_index(genre)
+            if index is None:
+                logging.warning(f"Unknown genre ignored. genre: {genre}")
+                continue
+            one_hot[row, index] = 1
+    return one_hot
+
+
+def serialize_embedding(embedding):
+    # The models were trained on the numpy string form of the embedding (DataFrame.astype(str)),
+    # so the exact same representation has to be sent
+    return str(np.asarray(embedding, dtype=np.float32))
+
+
+def encode_instances(embeddings, budgets, languages, runtimes, genres_list):
+    """Build N Vertex AI instances (column -> string) from N movies in one call."""
+    flags = np.where(one_hot_genres(genres_list), '1', '0').tolist()
+    instances = []
+    for embedding, budget, language, runtime, row_flags in zip(embeddings, budgets, languages, runtimes, flags):
+        instance = {
+            'title_embed': serialize_embedding(embedding),
+            'budget': str(budget),
+            'original_language': str(language),
+            'runtime': str(runtime),
+        }
+        instance.update(zip(GENRE_COLUMNS, row_flags))
+        instances.append(instance)
+    return instances
+
+
+def encode_instance(embedding, budget, language, runtime, genres):
+    return encode_instances([embedding], [budget], [language], [runtime], [genres])[0]
@@ -0,0 +1,213 @@
+import bisect
+import logging
+import math
+
+from django.db import transaction
+
+from .features import GENRES
+
+# Per-genre statistics of the predicted revenue / vote_average stored in Results, maintained
+# incrementally: Welford's running mean/variance, min/max, and a P² sketch for the median.
+# Every update is O(1) in time and state, so a Results insert costs a couple of row updates.
+
+METRICS = ('revenue', 'vote_average')
+ROUNDING = {'revenue': 0, 'vote_average': 2}
+
+
+class P2Quantile():
+    """P² streaming quantile estimate (Jain & Chlamtac, 1985) with five markers."""
+    def __init__(self, p=0.5, state=None):
+        self.p = p
+        self.dn = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+        state = state or {}
+        self.count = state.get('count', 0)
+        self.q = state.get('q', [])
+        self.n = state.get('n', [0, 1, 2, 3, 4])
+        self.np = state.get('np', [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0])
+
+    def to_dict(self):
+        return {'count': self.count, 'q': self.q, 'n': self.n, 'np': self.np}
+
+    def add(self, x):
+        self.count += 1
+        if self.count <= 5:
+            bisect.insort(self.q, x)
+            return
+
+        q, n = self.q, self.n
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = bisect.bisect_right(q, x) - 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.np[i] += self.dn[i]
+
+        for i in range(1, 4):
+            d = self.np[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                candidate = self._parabolic(i, d)
+                if not q[i - 1] < candidate < q[i + 1]:
+                    candidate = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = candidate
+                n[i] += d
+
+    def _parabolic(self, i, d):
+        q, n = self.q, self.n
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    def value(self):
+        if self.count == 0:
+            return None
+        if self.count <= 5:
+            # exact quantile of the stored observations
+            position = self.p * (len(self.q) - 1)
+            low = math.floor(position)
+            high = min(low + 1, len(self.q) - 1)
+            return self.q[low] + (self.q[high] - self.q[low]) * (position - low)
+        return self.q[2]
+
+
+class RunningStats():
+    def __init__(self, count=0, mean=0.0, m2=0.0, minimum=None, maximum=None, sketch=None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.minimum = minimum
+        self.maximum = maximum
+        self.median = P2Quantile(0.5, sketch)
+
+    @classmethod
+    def from_model(cls, stat):
+        return cls(stat.count, stat.mean, stat.m2, stat.minimum, stat.maximum, stat.sketch)
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.minimum = x if self.minimum is None else min(self.minimum, x)
+        self.maximum = x if self.maximum is None else max(self.maximum, x)
+        self.median.add(x)
+
+    @property
+    def std(self):
+        # sample standard deviation, as pandas computed it for genre_average.json
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def apply_to(self, stat):
+        stat.count = self.count
+        stat.mean = self.mean
+        stat.m2 = self.m2
+        stat.minimum = self.minimum
+        stat.maximum = self.maximum
+        stat.sketch = self.median.to_dict()
+        return stat
+
+
+def canonical_genre(genre):
+    genre = str(genre).strip().replace(' ', '_')
+    return genre if genre in GENRES else None
+
+
+def observations(input_data, output):
+    # (genre, metric, value) triples contributed by one Results row
+    if not isinstance(input_data, dict) or not isinstance(output, dict):
+        return
+    genres = {canonical_genre(genre) for genre in input_data.get('genres') or []} - {None}
+    for metric in METRICS:
+        try:
+            value = float(output.get(metric))
+        except (TypeError, ValueError):
+            continue
+        if math.isfinite(value):
+            for genre in genres:
+                yield genre, metric, value
+
+
+def record_results(results):
+    """Add Results rows to the statistics. Rows are locked per (genre, metric) so concurrent
+    workers don't lose updates."""
+    from ..models import GenreStatistic
+
+    updates = {}
+    for result in results:
+        if result.category == 'movie':
+            for genre, metric, value in observations(result.input, result.output):
+                updates.setdefault((genre, metric), []).append(value)
+    if not updates:
+        return
+
+    with transaction.atomic():
+        # fixed lock order avoids deadlocks between workers
+        for genre, metric in sorted(updates):
+            stat, _ = GenreStatistic.objects.select_for_update().get_or_create(genre=genre, metric=metric)
+            running = RunningStats.from_model(stat)
+            for value in updates[(genre, metric)]:
+                running.add(value)
+            running.apply_to(stat).save()
+
+
+def rebuild():
+    """Recompute every statistic from the stored Results in one streaming pass."""
+    from ..models import GenreStatistic, Results
+
+    stats = {}
+    rows = Results.objects.filter(category='movie').values_list('input', 'output').iterator(chunk_size=2000)
+    processed = 0
+    for input_data, output in rows:
+        for genre, metric, value in observations(input_data, output):
+            stats.setdefault((genre, metric), RunningStats()).add(value)
+        processed += 1
+
+    with transaction.atomic():
+        GenreStatistic.objects.all().delete()
+        GenreStatistic.objects.bulk_create([running.apply_to(GenreStatistic(genre=genre, metric=metric))
+                                            for (genre, metric), running in stats.items()])
+    logging.info(f"Genre statistics rebuilt. results: {processed}, statistics: {len(stats)}")
+    return processed
+
+
+def _summary(stat):
+    running = RunningStats.from_model(stat)
+    digits = ROUNDING.get(stat.metric, 2)
+
+    def fmt(value):
+        if value is None:
+            return None
+        return int(round(value)) if digits == 0 else round(value, digits)
+
+    return {
+        "count": running.count,
+        "min": fmt(running.minimum),
+        "max": fmt(running.maximum),
+        "mean": fmt(running.mean),
+        "std": fmt(running.std),
+        "median": fmt(running.median.value()),
+    }
+
+
+def genre_statistic(genre):
+    # Single (genre) lookup through the unique (genre, metric) index
+    from ..models import GenreStatistic
+
+    genre = canonical_genre(genre)
+    return {stat.metric: _summary(stat) for stat in GenreStatistic.objects.filter(genre=genre)}
+
+
+def genre_statistics():
+    # Same shape as genre_average.json: [{genre: {metric: {min, max, mean, std, median}}}]
+    from ..models import GenreStatistic
+
+    by_genre = {}
+    for stat in GenreStatistic.objects.all():
+        by_genre.setdefault(stat.genre, {})[stat.metric] = _summary(stat)
+    return [{genre: by_genre[genre]} for genre in GENRES if genre in by_genre]
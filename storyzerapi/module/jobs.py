@@ -0,0 +1,105 @@
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from ..models import PredictionJob
+from .prediction import run_movie_prediction, save_movie_result
+
+
+def enqueue(user_id, data):
+    job = PredictionJob.objects.create(user_id=user_id, input=data)
+    logging.info(f"Prediction job queued. job_id: {job.id}, user_id: {user_id}")
+    return job
+
+
+def enqueue_many(user_id, data_list):
+    # One job per item, so workers run them in parallel and each result is saved when it finishes
+    jobs = PredictionJob.objects.bulk_create([PredictionJob(user_id=user_id, input=data) for data in data_list])
+    logging.info(f"Prediction jobs queued. count: {len(jobs)}, user_id: {user_id}")
+    return jobs
+
+
+def claim_next(worker_name):
+    """Atomically move the oldest queued job (or a running job whose worker stopped
+    reporting for PREDICTION_JOB_TIMEOUT seconds) to running and return it. Stale running
+    jobs that already used PREDICTION_JOB_MAX_ATTEMPTS are marked failed instead."""
+    stale_before = timezone.now() - timedelta(seconds=settings.PREDICTION_JOB_TIMEOUT)
+    with transaction.atomic():
+        now = timezone.now()
+        abandoned = PredictionJob.objects.filter(status=PredictionJob.RUNNING, updated_at__lt=stale_before,
+                                                 attempts__gte=settings.PREDICTION_JOB_MAX_ATTEMPTS) \
+                                         .update(status=PredictionJob.FAILED, finished_at=now, updated_at=now,
+                                                 error=f"Worker stopped during the last of "
+                                                       f"{settings.PREDICTION_JOB_MAX_ATTEMPTS} attempts")
+        if abandoned:
+            logging.error(f"Prediction jobs failed after their last attempt timed out. count: {abandoned}")
+
+        job = PredictionJob.objects.select_for_update(skip_locked=True) \
+                                   .filter(status=PredictionJob.QUEUED).order_by('created_at').first()
+        if job is None:
+            job = PredictionJob.objects.select_for_update(skip_locked=True) \
+                                       .filter(status=PredictionJob.RUNNING, updated_at__lt=stale_before,
+                                               attempts__lt=settings.PREDICTION_JOB_MAX_ATTEMPTS) \
+                                       .order_by('created_at').first()
+        if job is None:
+            return None
+        job.status = PredictionJob.RUNNING
+        job.attempts += 1
+        job.worker = worker_name
+        job.started_at = timezone.now()
+        job.error = None
+        job.save(update_fields=['status', 'attempts', 'worker', 'started_at', 'error', 'updated_at'])
+    return job
+
+
+def run_job(job):
+    running = set()
+
+    def on_stage(name, status):
+        # Parallel stages can be in flight at the same time, the job shows all of them
+        if status == 'started':
+            running.add(name)
+        else:
+            running.discard(name)
+        PredictionJob.objects.filter(pk=job.pk).update(stage=', '.join(sorted(running)) or name,
+                                                       updated_at=timezone.now())
+
+    try:
+        run = run_movie_prediction(job.input, on_stage=on_stage)
+        results = save_movie_result(job.user_id, job.input, run['predict'], run['analysis'])
+    except Exception as e:
+        logging.error(f"Prediction job failed. job_id: {job.id}, error: {str(e)}\n{traceback.format_exc()}")
+        PredictionJob.objects.filter(pk=job.pk).update(status=PredictionJob.FAILED, error=str(e),
+                                                       finished_at=timezone.now(), updated_at=timezone.now())
+        return False
+
+    PredictionJob.objects.filter(pk=job.pk).update(status=PredictionJob.SUCCEEDED, stage=None, result=results,
+                                                   finished_at=timezone.now(), updated_at=timezone.now())
+    logging.info(f"Prediction job finished. job_id: {job.id}, total: {run.total:.3f}s")
+    return True
+
+
+def work(poll_interval=1.0, once=False, stop_event=None, worker_name=None):
+    # Claim and run jobs until stopped. With once=True, return when the queue is empty.
+    worker_name = worker_name or f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+    stop_event = stop_event or threading.Event()
+    processed = 0
+    while not stop_event.is_set():
+        close_old_connections()
+        job = claim_next(worker_name)
+        if job is None:
+            if once:
+                break
+            stop_event.wait(poll_interval)
+            continue
+        run_job(job)
+        processed += 1
+    close_old_connections()
+    return processed
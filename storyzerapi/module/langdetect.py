@@ -0,0 +1,45 @@
+import re
+import string
+
+# Fast local language identification used to skip the translation round-trip for English text.
+# Script check first (non-Latin letters -> not English), then English function words and
+# character trigrams to tell English apart from other Latin-script languages.
+
+ENGLISH_STOPWORDS = frozenset("""
+the and of to is was are were be been being that this these those with for from by at as
+it its he she they them his her their him we our you your who whom which what when where
+while into onto after before about over under between through but not no or if then than
+there here has have had will would can could should must do does did an one all out up so
+""".split())
+
+ENGLISH_TRIGRAMS = frozenset(['the', 'he ', ' th', 'and', 'nd ', ' an', 'ing', 'ng ', 'ion', ' of',
+                              'of ', 'er ', ' to', 'to ', 'ed ', 'is ', 'hat', 'tha', 'her', 'his'])
+
+WORD_RE = re.compile(r"[a-z']+")
+ASCII_LETTERS = frozenset(string.ascii_letters)
+
+
+def english_score(text):
+    """Return a 0..1 score of how likely text is English, without any network call."""
+    letters = [c for c in text if c.isalpha()]
+    if not letters:
+        return 1.0
+    ascii_ratio = sum(c in ASCII_LETTERS for c in letters) / len(letters)
+    if ascii_ratio < 0.9:
+        return 0.0
+
+    words = WORD_RE.findall(text.lower())
+    if not words:
+        return 0.0
+    stopword_ratio = sum(word in ENGLISH_STOPWORDS for word in words) / len(words)
+
+    padded = f" {' '.join(words)} "
+    trigrams = [padded[i:i + 3] for i in range(len(padded) - 2)]
+    trigram_ratio = sum(trigram in ENGLISH_TRIGRAMS for trigram in trigrams) / len(trigrams)
+
+    # English prose is ~40% function words and ~15% of its trigrams are in the list above
+    return min(1.0, ascii_ratio * (0.6 * min(stopword_ratio / 0.25, 1.0) + 0.4 * min(trigram_ratio / 0.1, 1.0)))
+
+
+def is_english(text, threshold=0.6):
+    return english_score(text) >= threshold
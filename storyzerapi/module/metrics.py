@@ -0,0 +1,97 @@
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+# Prometheus metrics of this worker. Under gunicorn, PROMETHEUS_MULTIPROC_DIR is set by gunicorn.conf.py
+# before the app is imported; every worker then writes its samples to mmap'ed files in that directory
+# and /metrics aggregates the files of all workers, whichever worker answers the scrape.
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+REQUESTS = Counter('storyzer_requests_total', 'HTTP requests by url name', ['route', 'method', 'status'])
+REQUEST_DURATION = Histogram('storyzer_request_duration_seconds', 'HTTP request latency by url name',
+                             ['route', 'method'], buckets=LATENCY_BUCKETS)
+REQUEST_DB_QUERIES = Histogram('storyzer_request_db_queries', 'Database queries per HTTP request by url name',
+                               ['route'], buckets=QUERY_COUNT_BUCKETS)
+# liveall: one series per live worker pid in multiprocess mode
+IN_FLIGHT = Gauge('storyzer_requests_in_flight', 'HTTP requests being handled by this worker',
+                  multiprocess_mode='liveall')
+
+SPAN_DURATION = Histogram('storyzer_span_duration_seconds', 'Duration of timing spans (prediction stages, DB writes)',
+                          ['span'], buckets=LATENCY_BUCKETS)
+UPSTREAM_DURATION = Histogram('storyzer_upstream_duration_seconds', 'Latency of OpenAI and Vertex AI calls',
+                              ['service', 'operation'], buckets=LATENCY_BUCKETS)
+UPSTREAM_ERRORS = Counter('storyzer_upstream_errors_total', 'Failed OpenAI and Vertex AI calls',
+                          ['service', 'operation', 'error'])
+UPSTREAM_RETRIES = Counter('storyzer_upstream_retries_total', 'Retried OpenAI calls', ['service', 'operation'])
+
+CACHE_LOOKUPS = Counter('storyzer_cache_lookups_total', 'Cache lookups by cache and result', ['cache', 'result'])
+
+# Title embedding model load of this worker (with the app preloaded: of the gunicorn master, which the workers share)
+EMBEDDING_LABELS = ['model', 'device', 'backend']
+EMBEDDING_LOAD_SECONDS = Gauge('storyzer_embedding_load_seconds', 'Time to load the embedding model',
+                               EMBEDDING_LABELS, multiprocess_mode='liveall')
+EMBEDDING_RSS_BYTES = Gauge('storyzer_embedding_rss_bytes', 'Resident memory added by loading the embedding model',
+                            EMBEDDING_LABELS, multiprocess_mode='liveall')
+EMBEDDING_PARAM_BYTES = Gauge('storyzer_embedding_param_bytes', 'Size of the embedding model parameters',
+                              EMBEDDING_LABELS, multiprocess_mode='liveall')
+
+# skipped: the scenario was already English and the translate_en ChatGPT call was saved
+TRANSLATIONS = Counter('storyzer_translations_total', 'Scenario translations by result (skipped or translated)',
+                       ['result'])
+
+
+def observe_request(route, method, status, seconds, db_queries=None):
+    REQUESTS.labels(route, method, str(status)).inc()
+    REQUEST_DURATION.labels(route, method).observe(seconds)
+    if db_queries is not None:
+        REQUEST_DB_QUERIES.labels(route).observe(db_queries)
+
+
+def observe_span(name, seconds):
+    SPAN_DURATION.labels(name).observe(seconds)
+
+
+def count_cache(cache, result, count=1):
+    if count:
+        CACHE_LOOKUPS.labels(cache, result).inc(count)
+
+
+def observe_embedding_load(stat):
+    # stat: an entry of EmbeddingModelRegistry.stats()
+    labels = (stat['model'], stat['device'], stat['backend'])
+    EMBEDDING_LOAD_SECONDS.labels(*labels).set(stat['load_seconds'])
+    EMBEDDING_RSS_BYTES.labels(*labels).set(stat['rss_delta_bytes'])
+    EMBEDDING_PARAM_BYTES.labels(*labels).set(stat['param_bytes'])
+
+
+def count_translation(result):
+    TRANSLATIONS.labels(result).inc()
+
+
+@contextmanager
+def upstream(service, operation):
+    """Time an OpenAI/Vertex call; exceptions are counted by type and re-raised."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        UPSTREAM_ERRORS.labels(service, operation, type(e).__name__).inc()
+        raise
+    finally:
+        UPSTREAM_DURATION.labels(service, operation).observe(time.perf_counter() - started)
+
+
+def render():
+    # (body, content type) of the exposition format, aggregated over all workers in multiprocess mode
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,202 @@
+import asyncio
+import contextlib
+import email.utils
+import itertools
+import logging
+import random
+import threading
+import time
+import weakref
+
+import openai
+import requests
+from django.conf import settings
+
+from .metrics import UPSTREAM_RETRIES, upstream
+
+# Rate limits, overload and network errors; other errors (invalid request, authentication) fail at once
+RETRYABLE_ERRORS = (openai.error.RateLimitError, openai.error.ServiceUnavailableError, openai.error.TryAgain,
+                    openai.error.APIConnectionError, openai.error.Timeout)
+
+
+def is_retryable(error):
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+    return isinstance(error, openai.error.APIError) and (error.http_status or 0) >= 500
+
+
+def retry_after(error):
+    # Seconds of the Retry-After header (delay or HTTP date) of a failed call, None without one
+    value = (getattr(error, 'headers', None) or {}).get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_delay(attempt, error):
+    """Seconds to wait before retrying after the given failed attempt (0 for the first call), None to
+    give up. Retry-After wins over the exponential backoff; a Retry-After longer than
+    OPENAI_BACKOFF_MAX fails the call instead of holding the request that long."""
+    if attempt >= settings.OPENAI_MAX_RETRIES or not is_retryable(error):
+        return None
+    delay = retry_after(error)
+    if delay is None:
+        # exponential backoff with jitter, so callers rate limited together do not retry together
+        delay = min(settings.OPENAI_BACKOFF_MAX, settings.OPENAI_BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+    return delay if delay <= settings.OPENAI_BACKOFF_MAX else None
+
+
+class _SharedSession(requests.Session):
+    # openai closes and replaces the session of every thread after a few minutes; the shared pool stays open
+    def close(self):
+        pass
+
+
+class OpenAIClient():
+    """Chat completions through one connection pool per worker, with timeouts, retries and
+    per-model concurrency limits. Shared by every ChatGPT instance (module level `client`).
+
+    - sync calls use one requests session (OPENAI_POOL_SIZE connections) across all threads,
+      async calls one aiohttp session per event loop
+    - OPENAI_CONNECT_TIMEOUT / OPENAI_TIMEOUT bound every attempt, OPENAI_DEADLINE the whole call
+      with its retries (kept below the gunicorn and proxy timeouts)
+    - rate limits (429), 5xx and connection errors are retried up to OPENAI_MAX_RETRIES times,
+      honoring Retry-After, as long as the deadline allows
+    - at most OPENAI_MODEL_CONCURRENCY[model] (default OPENAI_MAX_CONCURRENCY, 0: no limit) calls
+      of a model run at once in this worker; waiting callers queue, retries keep their slot
+    """
+    def __init__(self):
+        self._session = None
+        self._lock = threading.Lock()
+        self._semaphores = {} # model -> threading.BoundedSemaphore
+        self._async_sessions = weakref.WeakKeyDictionary() # event loop -> aiohttp.ClientSession
+        self._async_semaphores = weakref.WeakKeyDictionary() # event loop -> {model: asyncio.Semaphore}
+
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                session = _SharedSession()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=settings.OPENAI_POOL_SIZE,
+                                                        max_retries=2) # connection errors, as openai's own session
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._session = session
+            return self._session
+
+    def _aiohttp_session(self):
+        # Bound to the loop it was created in. Without it openai opens a new session for every call.
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        session = self._async_sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=settings.OPENAI_ASYNC_MAX_CONNECTIONS)
+            session = self._async_sessions[loop] = aiohttp.ClientSession(connector=connector)
+        return session
+
+    @staticmethod
+    def concurrency(model):
+        return settings.OPENAI_MODEL_CONCURRENCY.get(model, settings.OPENAI_MAX_CONCURRENCY)
+
+    def _limit(self, model):
+        limit = self.concurrency(model)
+        if limit <= 0:
+            return contextlib.nullcontext()
+        with self._lock:
+            if model not in self._semaphores:
+                self._semaphores[model] = threading.BoundedSemaphore(limit)
+            return self._semaphores[model]
+
+    def _alimit(self, model):
+        limit = self.concurrency(model)
+        if limit <= 0:
+            return contextlib.nullcontext()
+        semaphores = self._async_semaphores.setdefault(asyncio.get_running_loop(), {})
+        if model not in semaphores:
+            semaphores[model] = asyncio.Semaphore(limit)
+        return semaphores[model]
+
+    def _params(self, model, messages, timeout, **params):
+        return dict(params, model=model, messages=messages, api_key=settings.OPENAI_API_KEY,
+                    api_base=settings.OPENAI_API_BASE or None,
+                    request_timeout=(settings.OPENAI_CONNECT_TIMEOUT, timeout))
+
+    @staticmethod
+    def _attempt_timeout(deadline):
+        # OPENAI_TIMEOUT, or what is left until the call's OPENAI_DEADLINE
+        return min(settings.OPENAI_TIMEOUT, max(deadline - time.monotonic(), 0.001))
+
+    def _retry_delay(self, model, attempt, error, deadline):
+        delay = retry_delay(attempt, error)
+        if delay is not None and time.monotonic() + delay >= deadline:
+            delay = None # no time left for another attempt
+        if delay is not None:
+            UPSTREAM_RETRIES.labels("openai", model).inc()
+            logging.warning(f"OpenAI call failed, retrying. model: {model}, attempt: {attempt + 1}, "
+                            f"delay: {delay:.1f}s, error: {str(error)}")
+        return delay
+
+    def _call(self, model, request):
+        # request(timeout) makes one attempt
+        deadline = time.monotonic() + settings.OPENAI_DEADLINE
+        for attempt in itertools.count():
+            try:
+                with upstream("openai", model):
+                    return request(self._attempt_timeout(deadline))
+            except Exception as e:
+                delay = self._retry_delay(model, attempt, e, deadline)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+
+    def chat_completion(self, model, messages, **params):
+        with self._limit(model):
+            return self._call(model, lambda timeout: openai.ChatCompletion.create(
+                **self._params(model, messages, timeout, **params)))
+
+    def chat_completion_stream(self, model, messages, **params):
+        # Chunks of a streamed completion. Only starting the stream is retried, chunks that were
+        # already yielded cannot be taken back. The model's slot is held until the last chunk.
+        with self._limit(model):
+            response = self._call(model, lambda timeout: openai.ChatCompletion.create(
+                stream=True, **self._params(model, messages, timeout, **params)))
+            yield from response
+
+    async def _acall(self, model, request):
+        # _call for coroutines: await request(timeout) makes one attempt
+        openai.aiosession.set(self._aiohttp_session())
+        deadline = time.monotonic() + settings.OPENAI_DEADLINE
+        for attempt in itertools.count():
+            try:
+                with upstream("openai", model):
+                    return await request(self._attempt_timeout(deadline))
+            except Exception as e:
+                delay = self._retry_delay(model, attempt, e, deadline)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+
+    async def achat_completion(self, model, messages, **params):
+        async with self._alimit(model):
+            return await self._acall(model, lambda timeout: openai.ChatCompletion.acreate(
+                **self._params(model, messages, timeout, **params)))
+
+    async def achat_completion_stream(self, model, messages, **params):
+        # chat_completion_stream for the async views
+        async with self._alimit(model):
+            response = await self._acall(model, lambda timeout: openai.ChatCompletion.acreate(
+                stream=True, **self._params(model, messages, timeout, **params)))
+            async for chunk in response:
+                yield chunk
+
+
+client = OpenAIClient()
+# every requests call of the openai package goes through the shared pool
+openai.requestssession = client.session
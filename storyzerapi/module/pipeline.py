@@ -0,0 +1,219 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .timing import span
+
+
+def _call_stage(func, stage_context):
+    # Stage threads are no request threads, so Django never closes the DB connections they open
+    # (embed_title reads and writes the TitleEmbedding table); close them as jobs.work does.
+    close_old_connections()
+    try:
+        return func(stage_context)
+    finally:
+        close_old_connections()
+
+
+class Stage():
+    # A unit of work in a Pipeline. func receives a dict with the pipeline inputs and
+    # the outputs of every finished stage (keyed by stage name) and returns this stage's output.
+    # afunc is an optional coroutine function with the same contract, used by Pipeline.arun.
+    def __init__(self, name, func, requires=(), afunc=None):
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.afunc = afunc
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, requires={list(self.requires)})"
+
+
+class PipelineRun():
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.outputs = {}
+        self.offsets = {} # seconds from the start of the run until the stage started
+        self.durations = {}
+        self.total = 0.0
+
+    def __getitem__(self, name):
+        return self.outputs[name]
+
+    @property
+    def critical_path(self):
+        return self.pipeline.critical_path(self.durations)
+
+
+class Pipeline():
+    """A dependency graph of stages. Every stage starts as soon as all stages it requires have
+    finished, so independent stages run concurrently on a shared thread pool (run) or as tasks
+    on the event loop (arun)."""
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self._by_name = {stage.name: stage for stage in self.stages}
+        if len(self._by_name) != len(self.stages):
+            raise ValueError("Stage names must be unique")
+        self.order = self._topological_order()
+
+    def _topological_order(self):
+        order, visiting, visited = [], set(), set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage dependency cycle at '{name}'")
+            if name not in self._by_name:
+                raise ValueError(f"Unknown stage '{name}'")
+            visiting.add(name)
+            for dep in self._by_name[name].requires:
+                visit(dep)
+            visiting.discard(name)
+            visited.add(name)
+            order.append(name)
+
+        for stage in self.stages:
+            visit(stage.name)
+        return order
+
+    def upto(self, *names):
+        # Sub-pipeline with only the given stages and everything they require
+        needed, stack = set(), list(names)
+        while stack:
+            name = stack.pop()
+            if name not in needed:
+                needed.add(name)
+                stack.extend(self._by_name[name].requires)
+        return Pipeline([stage for stage in self.stages if stage.name in needed])
+
+    def graph(self):
+        return {name: list(self._by_name[name].requires) for name in self.order}
+
+    def critical_path(self, durations):
+        # Longest chain of dependent stages weighted by durations
+        finish, previous = {}, {}
+        for name in self.order:
+            requires = self._by_name[name].requires
+            before = max(requires, key=lambda dep: finish[dep]) if requires else None
+            finish[name] = durations.get(name, 0.0) + (finish[before] if before else 0.0)
+            previous[name] = before
+        if not finish:
+            return []
+        path, name = [], max(finish, key=finish.get)
+        while name is not None:
+            path.append(name)
+            name = previous[name]
+        return path[::-1]
+
+    def run(self, inputs, on_stage=None):
+        """Run every stage and return a PipelineRun. on_stage(name, status) is called with
+        'started'/'finished'/'failed'. The first failing stage's exception is re-raised."""
+        run = PipelineRun(self)
+        context = dict(inputs)
+        pending = [self._by_name[name] for name in self.order]
+        running = {}
+        started = time.perf_counter()
+        executor = get_executor()
+
+        def call(stage, stage_context):
+            offset = time.perf_counter()
+            with span(stage.name):
+                output = _call_stage(stage.func, stage_context)
+            return output, offset - started, time.perf_counter() - offset
+
+        try:
+            while pending or running:
+                for stage in [stage for stage in pending if all(dep in run.outputs for dep in stage.requires)]:
+                    pending.remove(stage)
+                    if on_stage:
+                        on_stage(stage.name, 'started')
+                    # copy_context: the stage thread records its spans into the caller's request trace
+                    running[executor.submit(contextvars.copy_context().run, call, stage, dict(context))] = stage
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    try:
+                        output, offset, duration = future.result()
+                    except Exception:
+                        logging.error(f"Pipeline stage failed. stage: {stage.name}")
+                        if on_stage:
+                            on_stage(stage.name, 'failed')
+                        raise
+                    run.outputs[stage.name] = context[stage.name] = output
+                    run.offsets[stage.name] = offset
+                    run.durations[stage.name] = duration
+                    if on_stage:
+                        on_stage(stage.name, 'finished')
+        finally:
+            for future in running:
+                future.cancel()
+
+        run.total = time.perf_counter() - started
+        return run
+
+    async def arun(self, inputs, on_stage=None):
+        """Run on the event loop, same result as run(). Stages with an afunc are awaited, the others
+        (CPU bound ones like the title embedding) run in a thread through sync_to_async."""
+        run = PipelineRun(self)
+        context = dict(inputs)
+        tasks = {}
+        started = time.perf_counter()
+
+        async def call(stage):
+            for dep in stage.requires:
+                await tasks[dep]
+            if on_stage:
+                on_stage(stage.name, 'started')
+            func = stage.afunc or sync_to_async(functools.partial(_call_stage, stage.func), thread_sensitive=False)
+            offset = time.perf_counter()
+            try:
+                with span(stage.name):
+                    output = await func(dict(context))
+            except Exception:
+                logging.error(f"Pipeline stage failed. stage: {stage.name}")
+                if on_stage:
+                    on_stage(stage.name, 'failed')
+                raise
+            run.outputs[stage.name] = context[stage.name] = output
+            run.offsets[stage.name] = offset - started
+            run.durations[stage.name] = time.perf_counter() - offset
+            if on_stage:
+                on_stage(stage.name, 'finished')
+
+        # created in topological order, so every task's dependencies already exist
+        for name in self.order:
+            tasks[name] = asyncio.ensure_future(call(self._by_name[name]))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            # the stages after a failed one fail with the same exception, collect them all
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        run.total = time.perf_counter() - started
+        return run
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.PIPELINE_MAX_WORKERS,
+                                           thread_name_prefix='pipeline')
+        return _executor
@@ -0,0 +1,188 @@
+import logging
+import re
+
+from django.conf import settings
+
+from ..models import Results
+from .chatgpt import ChatGPT
+from .embedding_cache import get_title_embedding
+from .features import encode_instance
+from . import prompts, reference
+from .pipeline import Pipeline, Stage
+from .timing import span
+from .translation import atranslate_en, translate_en
+from .vertex import aclassify_scenario_type, apredict_potential, classify_scenario_type, predict_potential
+
+# Movie prediction stages. Inputs: title, scenario, budget, language, runtime, genres, request_data
+#
+#   check_scenario (GPT-4)
+#   translate (local check, gpt-3.5-turbo) -> classify_scenario (Vertex) --+
+#   embed_title -> features -----------------------------------------------+-> predict (Vertex) -> analysis (GPT-4)
+
+
+def check_scenario(ctx):
+    # TODO: scenario가 scenario가 아닌 경우 제대로 된 시나리오를 입력하라는 메시지를 출력
+    return ChatGPT(ctx['scenario'], settings.CHATGPT['system_prompt']['scenario_classification']).chatgpt_request() # 시나리오 분류
+
+
+def _clean_scenario(scenario):
+    scenario = re.sub(r'[^a-zA-Z0-9 ]', '', scenario) # remove special characters
+    scenario = re.sub(r'\s+', ' ', scenario) # remove extra spaces
+    return scenario.strip() # remove leading and trailing spaces
+
+
+def translate(ctx):
+    return _clean_scenario(translate_en(ctx['scenario']))
+
+
+def embed_title(ctx):
+    ## title embedding
+    return get_title_embedding(ctx['title'])
+
+
+def features(ctx):
+    # Make Input Data
+    return encode_instance(ctx['embed_title'], ctx['budget'], ctx['language'], ctx['runtime'], ctx['genres'])
+
+
+def classify_scenario(ctx):
+    return classify_scenario_type(ctx['translate'])
+
+
+def predict(ctx):
+    return predict_potential(ctx['classify_scenario'], ctx['features'])
+
+
+def analysis_prompts(ctx):
+    genre_average = reference.genre_average()
+    user_prompt, system_prompt = prompts.analysis_prompts(ctx, genre_average)
+    if settings.PROMPT_TOKEN_LOG:
+        prompts.log_token_savings(ctx, genre_average, user_prompt, system_prompt)
+    return user_prompt, system_prompt
+
+
+def analysis(ctx):
+    user_prompt, system_prompt = analysis_prompts(ctx)
+    reply = ChatGPT(user_prompt, system_prompt).chatgpt_request()
+    return reply.replace('\\', '')
+
+
+def stream_analysis(ctx):
+    # Yields the analysis as it is generated, for the streaming endpoint
+    user_prompt, system_prompt = analysis_prompts(ctx)
+    for delta in ChatGPT(user_prompt, system_prompt).chatgpt_stream():
+        yield delta.replace('\\', '')
+
+
+# Coroutine versions of the OpenAI and Vertex AI stages for Pipeline.arun (async views).
+# embed_title and features are CPU bound and run in a thread.
+
+
+async def acheck_scenario(ctx):
+    return await ChatGPT(ctx['scenario'], settings.CHATGPT['system_prompt']['scenario_classification']).achatgpt_request()
+
+
+async def atranslate(ctx):
+    return _clean_scenario(await atranslate_en(ctx['scenario']))
+
+
+async def aclassify_scenario(ctx):
+    return await aclassify_scenario_type(ctx['translate'])
+
+
+async def apredict(ctx):
+    return await apredict_potential(ctx['classify_scenario'], ctx['features'])
+
+
+async def aanalysis(ctx):
+    user_prompt, system_prompt = analysis_prompts(ctx)
+    reply = await ChatGPT(user_prompt, system_prompt).achatgpt_request()
+    return reply.replace('\\', '')
+
+
+async def astream_analysis(ctx):
+    user_prompt, system_prompt = analysis_prompts(ctx)
+    async for delta in ChatGPT(user_prompt, system_prompt).achatgpt_stream():
+        yield delta.replace('\\', '')
+
+
+movie_pipeline = Pipeline([
+    Stage('check_scenario', check_scenario, afunc=acheck_scenario),
+    Stage('translate', translate, afunc=atranslate),
+    Stage('embed_title', embed_title),
+    Stage('features', features, requires=['embed_title']),
+    Stage('classify_scenario', classify_scenario, requires=['translate'], afunc=aclassify_scenario),
+    Stage('predict', predict, requires=['classify_scenario', 'features'], afunc=apredict),
+    Stage('analysis', analysis, requires=['predict'], afunc=aanalysis),
+])
+
+# Everything up to the numeric predictions, the analysis is streamed separately. The GPT-4 scenario
+# check is skipped: its reply is not used by any later stage and would hold back the predictions.
+prediction_pipeline = movie_pipeline.upto('predict')
+
+
+def movie_inputs(data):
+    # check if the scenario are in English. 
+    # Otherwise, translate them into English using chatgpt
+    return {
+        'title': str(data.get('title')),
+        'scenario': str(data.get('scenario')).replace('\n', ' '), # remove line breaks
+        'budget': str(data.get('budget')),
+        'language': str(data.get('language')),
+        'runtime': str(data.get('runtime')),
+        'genres': data.get('genres'),
+        'request_data': data,
+    }
+
+
+def run_movie_prediction(data, on_stage=None):
+    return movie_pipeline.run(movie_inputs(data), on_stage=on_stage)
+
+
+async def arun_movie_prediction(data, on_stage=None):
+    return await movie_pipeline.arun(movie_inputs(data), on_stage=on_stage)
+
+
+def stream_movie_prediction(data, on_stage=None):
+    # Runs the prediction stages, then yields ('analysis', delta) pieces. Yields ('predictions', ...)
+    # as soon as Vertex returns and finally ('done', analysis text).
+    inputs = movie_inputs(data)
+    run = prediction_pipeline.run(inputs, on_stage=on_stage)
+    yield 'predictions', run['predict']
+
+    reply = []
+    for delta in stream_analysis(dict(inputs, **run.outputs)):
+        reply.append(delta)
+        yield 'analysis', delta
+    yield 'done', ''.join(reply)
+
+
+async def astream_movie_prediction(data, on_stage=None):
+    # stream_movie_prediction for the async views
+    inputs = movie_inputs(data)
+    run = await prediction_pipeline.arun(inputs, on_stage=on_stage)
+    yield 'predictions', run['predict']
+
+    reply = []
+    async for delta in astream_analysis(dict(inputs, **run.outputs)):
+        reply.append(delta)
+        yield 'analysis', delta
+    yield 'done', ''.join(reply)
+
+
+DEFAULT_RESULT_USER_ID = 5 # TODO: 유저 로그인 기능 완료 시 삭제
+
+
+def save_movie_result(user_id, data, predictions, reply):
+    with span("db_write"):
+        if user_id is not None:
+            results = Results.objects.create(user_id=user_id, input=data, 
+                                             output=predictions, analyze=reply, category="movie")
+            results.save()
+            logging.info(f"User prediction saved. user_id: {user_id}")
+        else: # TODO: 유저 로그인 기능 완료 시 삭제
+            results = Results.objects.create(user_id=DEFAULT_RESULT_USER_ID, input=data,
+                                            output=predictions, analyze=reply, category="movie")
+            results.save()
+            logging.info(f"User prediction saved to default user. user_id: {user_id}")
+    return results
@@ -0,0 +1,86 @@
+import json
+import logging
+
+from django.conf import settings
+
+try:
+    import tiktoken
+except ImportError: # in requirements.txt; without it the counts are an estimate
+    tiktoken = None
+
+_encodings = {}
+
+
+def count_tokens(text, model="gpt-4"):
+    text = str(text)
+    if tiktoken is not None:
+        encoding = _encodings.get(model)
+        if encoding is None:
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoding = tiktoken.get_encoding("cl100k_base")
+            _encodings[model] = encoding
+        return len(encoding.encode(text))
+    # ~4 characters per token for ASCII, about one token per Hangul/other character
+    ascii_chars = sum(1 for c in text if c.isascii())
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def _compact(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def legacy_analysis_prompts(ctx, genre_average):
+    # The prompts as they were built before compaction, only used to log the saving
+    predictions = ctx['predict']
+    user_prompt = f"{json.dumps(ctx['request_data'])}, {json.dumps(predictions)}, {json.dumps(genre_average.raw)}"
+    system_prompt = settings.CHATGPT['system_prompt']['scenario_analysis'].format(
+        title=ctx['title'], scenario=ctx['translate'], revenue=predictions['revenue'],
+        budget=ctx['budget'], vote_average=predictions['vote_average'],
+        genres=ctx['genres'], type_keyword=predictions['scenario']['type_keyword'],
+        genre_average=genre_average.raw)
+    return user_prompt, system_prompt
+
+
+def _analysis_sections(ctx, genre_average):
+    # Values substituted into the scenario_analysis system prompt
+    predictions = ctx['predict']
+    return {
+        'title': ctx['title'],
+        'scenario': ctx['translate'],
+        'revenue': predictions['revenue'],
+        'budget': ctx['budget'],
+        'vote_average': predictions['vote_average'],
+        'genres': _compact(ctx['genres']),
+        'type_keyword': _compact(predictions['scenario']['type_keyword']),
+        'genre_average': _compact(genre_average.select(ctx['genres'])),
+    }
+
+
+def analysis_prompts(ctx, genre_average):
+    """System and user prompt for the scenario_analysis call.
+
+    Only the stats of the movie's own genres are included, and everything already in the
+    system prompt (title, translated scenario, budget, predictions, genres, genre stats) is
+    left out of the user prompt. Returns (user_prompt, system_prompt)."""
+    system_prompt = settings.CHATGPT['system_prompt']['scenario_analysis'].format(
+        **_analysis_sections(ctx, genre_average))
+    # what the system prompt does not carry yet
+    user_prompt = _compact({
+        'language': ctx['language'],
+        'runtime': ctx['runtime'],
+        'scenario_type': ctx['predict']['scenario']['pred_type'],
+    })
+    return user_prompt, system_prompt
+
+
+def log_token_savings(ctx, genre_average, user_prompt, system_prompt, model="gpt-4"):
+    # Tokens are only counted here (PROMPT_TOKEN_LOG), not for every prediction
+    tokens = {name: count_tokens(value, model) for name, value in _analysis_sections(ctx, genre_average).items()}
+    tokens['system_prompt'] = count_tokens(system_prompt, model)
+    tokens['user_prompt'] = count_tokens(user_prompt, model)
+    legacy_user, legacy_system = legacy_analysis_prompts(ctx, genre_average)
+    before = count_tokens(legacy_system, model) + count_tokens(legacy_user, model)
+    after = tokens['system_prompt'] + tokens['user_prompt']
+    logging.info(f"Analysis prompt tokens. before: {before}, after: {after}, sections: {json.dumps(tokens)}")
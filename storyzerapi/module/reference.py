@@ -0,0 +1,71 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+
+class ReferenceFile():
+    """A JSON file parsed once and kept in memory. The file's mtime is checked on access
+    (at most every REFERENCE_DATA_CHECK_INTERVAL seconds) and the file is re-parsed when it changes."""
+    def __init__(self, path, build):
+        self.path = os.path.join(settings.BASE_DIR, path)
+        self.build = build
+        self._data = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        now = time.monotonic()
+        if self._data is not None and now - self._checked_at < settings.REFERENCE_DATA_CHECK_INTERVAL:
+            return self._data
+        with self._lock:
+            self._checked_at = now
+            mtime = os.stat(self.path).st_mtime_ns
+            if self._data is None or mtime != self._mtime:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._data = self.build(json.load(f))
+                self._mtime = mtime
+                logging.info(f"Reference data loaded. path: {self.path}")
+            return self._data
+
+
+class GenreAverages():
+    def __init__(self, raw):
+        self.raw = raw # list of {genre: stats}, as stored in genre_average.json
+        self.by_genre = {genre: stats for item in raw for genre, stats in item.items()}
+        # /average/genres body, serialized once (same compact form as DRF's JSONRenderer)
+        self.body = json.dumps(raw, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+
+    def select(self, genres):
+        # stats of the given genres only; "Science Fiction" is stored as "Science_Fiction"
+        selected = {}
+        for genre in genres or []:
+            genre = str(genre).strip().replace(' ', '_')
+            if genre in self.by_genre:
+                selected[genre] = self.by_genre[genre]
+        return selected
+
+
+class MovieResultFormat():
+    def __init__(self, raw):
+        self.raw = raw
+        self.input_format = raw['results'][0]['input']
+        self.input_keys = list(self.input_format.keys())
+
+
+_genre_average = ReferenceFile('genre_average.json', GenreAverages)
+_movie_result_format = ReferenceFile(os.path.join('storyzerapi', 'formats', 'movie_result_format.json'), MovieResultFormat)
+
+
+def genre_average():
+    return _genre_average.get()
+
+
+def movie_result_format():
+    return _movie_result_format.get()
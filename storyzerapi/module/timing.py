@@ -0,0 +1,86 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from .metrics import observe_span
+
+_current_trace = contextvars.ContextVar('storyzer_trace', default=None)
+
+
+class Trace():
+    """Spans recorded while handling one request. Spans may be added from pipeline threads."""
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = [] # (name, offset seconds, duration seconds, desc)
+        self.db_queries = 0
+        self._lock = threading.Lock()
+
+    def add(self, name, started, duration, desc=None):
+        with self._lock:
+            self.spans.append((name, started - self.started, duration, desc))
+
+    def count_query(self):
+        with self._lock:
+            self.db_queries += 1
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total=None):
+        # Value of the Server-Timing header, durations in milliseconds
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span[1])
+        entries = []
+        for name, _, duration, desc in spans:
+            entry = f"{name};dur={duration * 1000:.1f}"
+            if desc:
+                entry += ';desc="' + str(desc).replace('"', "'") + '"'
+            entries.append(entry)
+        if total is not None:
+            entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+    def as_list(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span[1])
+        return [dict({"name": name, "offset_ms": round(offset * 1000, 1), "dur_ms": round(duration * 1000, 1)},
+                     **({"desc": desc} if desc else {}))
+                for name, offset, duration, desc in spans]
+
+
+def start_trace():
+    # Returns (trace, token), pass the token to end_trace
+    trace = Trace()
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(token):
+    _current_trace.reset(token)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name, desc=None):
+    """Time the block, add it to the current request's trace (if any) and to the Prometheus
+    span histogram."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started
+        observe_span(name, duration)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(name, started, duration, desc)
+
+
+def count_query(execute, sql, params, many, context):
+    # connection.execute_wrappers hook: counts the queries of the current request
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.count_query()
+    return execute(sql, params, many, context)
@@ -0,0 +1,35 @@
+import logging
+
+from django.conf import settings
+
+from .chatgpt import ChatGPT
+from .langdetect import is_english
+from .metrics import count_translation
+
+
+def _needs_translation(text):
+    # English input is returned as is; the translate_en prompt would only repeat it
+    if is_english(text, threshold=settings.TRANSLATION_SKIP_THRESHOLD):
+        count_translation("skipped")
+        logging.info("Translation skipped, text is already in English.")
+        return False
+
+    count_translation("translated")
+    return True
+
+
+def _translator(text):
+    return ChatGPT(text, settings.CHATGPT['system_prompt']['translate_en'], model="gpt-3.5-turbo")
+
+
+def translate_en(text):
+    if not _needs_translation(text):
+        return text
+    return _translator(text).chatgpt_request() # 영어로 번역
+
+
+async def atranslate_en(text):
+    if not _needs_translation(text):
+        return text
+    return await _translator(text).achatgpt_request()
+
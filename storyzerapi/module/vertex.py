@@ -0,0 +1,318 @@
+import asyncio
+import functools
+import itertools
+import logging
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from google.protobuf import json_format
+from google.protobuf.struct_pb2 import Value
+
+from .metrics import upstream
+
+SCOPES = ['https://www.googleapis.com/auth/cloud-platform']
+
+# Endpoints that take the potential instance and return {'value': ...}
+REGRESSION_ENDPOINTS = ('revenue', 'vote_average')
+
+
+def endpoint_path(project, location, endpoint):
+    return f"projects/{project}/locations/{location}/endpoints/{endpoint}"
+
+
+@functools.lru_cache(maxsize=None)
+def endpoint_paths():
+    # Resolved once per process from settings.PROJECT/LOCATION/*_ENDPOINT
+    return {
+        'classification': endpoint_path(settings.PROJECT, settings.LOCATION, settings.CLASSIFICATION_ENDPOINT),
+        'revenue': endpoint_path(settings.PROJECT, settings.LOCATION, settings.REVENUE_ENDPOINT),
+        'vote_average': endpoint_path(settings.PROJECT, settings.LOCATION, settings.VOTE_ENDPOINT),
+    }
+
+
+def load_credentials():
+    # Explicit service account file if present, otherwise application default credentials
+    if settings.CREDENTIALS and os.path.exists(settings.CREDENTIALS):
+        from google.oauth2 import service_account
+        return service_account.Credentials.from_service_account_file(settings.CREDENTIALS, scopes=SCOPES)
+    return None
+
+
+def default_client_factory(api_endpoint, credentials=None, channel_options=(), insecure=False):
+    from google.cloud import aiplatform
+    from google.cloud.aiplatform_v1.services.prediction_service.transports import PredictionServiceGrpcTransport
+
+    target = api_endpoint if ':' in api_endpoint else f"{api_endpoint}:443"
+    if insecure:
+        # Plaintext channel, used for local fake PredictionService servers
+        import grpc
+        channel = grpc.insecure_channel(target, options=list(channel_options))
+    else:
+        channel = PredictionServiceGrpcTransport.create_channel(target, credentials=credentials, scopes=SCOPES,
+                                                                options=list(channel_options))
+    transport = PredictionServiceGrpcTransport(channel=channel)
+    return aiplatform.gapic.PredictionServiceClient(transport=transport)
+
+
+def default_async_client_factory(api_endpoint, credentials=None, channel_options=(), insecure=False):
+    from google.cloud.aiplatform_v1.services.prediction_service import PredictionServiceAsyncClient
+    from google.cloud.aiplatform_v1.services.prediction_service.transports import \
+        PredictionServiceGrpcAsyncIOTransport
+
+    target = api_endpoint if ':' in api_endpoint else f"{api_endpoint}:443"
+    if insecure:
+        from grpc import aio
+        channel = aio.insecure_channel(target, options=list(channel_options))
+    else:
+        channel = PredictionServiceGrpcAsyncIOTransport.create_channel(target, credentials=credentials,
+                                                                       scopes=SCOPES, options=list(channel_options))
+    return PredictionServiceAsyncClient(transport=PredictionServiceGrpcAsyncIOTransport(channel=channel))
+
+
+def channel_options():
+    return [
+        ('grpc.keepalive_time_ms', settings.VERTEX_KEEPALIVE_MS),
+        ('grpc.keepalive_timeout_ms', 10000),
+        ('grpc.keepalive_permit_without_calls', 1),
+        ('grpc.http2.max_pings_without_data', 0),
+    ]
+
+
+class VertexClientPool():
+    """A fixed number of PredictionServiceClients whose gRPC channels are reused across requests.
+
+    Clients are created lazily and handed out round-robin. The factory can be replaced (setting
+    VERTEX_CLIENT_FACTORY or set_factory) so tests can point the pool at a fake server.
+    """
+    def __init__(self, size=None, api_endpoint=None, factory=None):
+        self.size = max(settings.VERTEX_CLIENT_POOL_SIZE if size is None else size, 1)
+        self.api_endpoint = api_endpoint or settings.VERTEX_API_ENDPOINT
+        self._factory = factory
+        self._clients = []
+        self._cycle = None
+        self._lock = threading.Lock()
+
+    @property
+    def factory(self):
+        if self._factory is None:
+            self._factory = import_string(settings.VERTEX_CLIENT_FACTORY) if settings.VERTEX_CLIENT_FACTORY \
+                            else default_client_factory
+        return self._factory
+
+    def _create_clients(self):
+        credentials = None if settings.VERTEX_INSECURE else load_credentials()
+        clients = [self.factory(self.api_endpoint, credentials=credentials,
+                                channel_options=channel_options(), insecure=settings.VERTEX_INSECURE)
+                   for _ in range(self.size)]
+        logging.info(f"Vertex AI client pool created. api_endpoint: {self.api_endpoint}, size: {self.size}")
+        return clients
+
+    def get(self):
+        with self._lock:
+            if not self._clients:
+                self._clients = self._create_clients()
+                self._cycle = itertools.cycle(self._clients)
+            return next(self._cycle)
+
+    def set_factory(self, factory, api_endpoint=None):
+        with self._lock:
+            self._factory = factory
+            if api_endpoint is not None:
+                self.api_endpoint = api_endpoint
+            self._clients = []
+            self._cycle = None
+
+
+client_pool = VertexClientPool()
+
+
+class AsyncVertexClientPool():
+    """PredictionServiceAsyncClients for the async views. A grpc.aio channel belongs to the event loop
+    it was created in, so every running loop gets its own VERTEX_CLIENT_POOL_SIZE clients. The factory
+    is replaced as in VertexClientPool (setting VERTEX_ASYNC_CLIENT_FACTORY or set_factory)."""
+    def __init__(self, size=None, api_endpoint=None, factory=None):
+        self.size = max(settings.VERTEX_CLIENT_POOL_SIZE if size is None else size, 1)
+        self.api_endpoint = api_endpoint or settings.VERTEX_API_ENDPOINT
+        self._factory = factory
+        self._cycles = weakref.WeakKeyDictionary() # event loop -> itertools.cycle of clients
+
+    @property
+    def factory(self):
+        if self._factory is None:
+            self._factory = import_string(settings.VERTEX_ASYNC_CLIENT_FACTORY) \
+                            if settings.VERTEX_ASYNC_CLIENT_FACTORY else default_async_client_factory
+        return self._factory
+
+    def get(self):
+        loop = asyncio.get_running_loop()
+        cycle = self._cycles.get(loop)
+        if cycle is None:
+            credentials = None if settings.VERTEX_INSECURE else load_credentials()
+            cycle = self._cycles[loop] = itertools.cycle([
+                self.factory(self.api_endpoint, credentials=credentials, channel_options=channel_options(),
+                             insecure=settings.VERTEX_INSECURE)
+                for _ in range(self.size)])
+            logging.info(f"Vertex AI async client pool created. api_endpoint: {self.api_endpoint}, size: {self.size}")
+        return next(cycle)
+
+    def set_factory(self, factory, api_endpoint=None):
+        # clients of every loop are created again on their next get()
+        self._factory = factory
+        if api_endpoint is not None:
+            self.api_endpoint = api_endpoint
+        self._cycles = weakref.WeakKeyDictionary()
+
+
+async_client_pool = AsyncVertexClientPool()
+
+EMPTY_PARAMETERS = json_format.ParseDict({}, Value())
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    # Bounded thread pool shared by all requests of this worker for concurrent Vertex calls
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.VERTEX_MAX_CONCURRENCY,
+                                           thread_name_prefix='vertex')
+        return _executor
+
+
+def predict(endpoint, instances, client=None, timeout=None):
+    client = client or client_pool.get()
+    timeout = settings.VERTEX_TIMEOUT if timeout is None else timeout
+    instances = [json_format.ParseDict(instance, Value()) for instance in instances]
+    with upstream('vertex', endpoint):
+        response = client.predict(endpoint=endpoint_paths()[endpoint], instances=instances,
+                                  parameters=EMPTY_PARAMETERS, timeout=timeout)
+    return [dict(prediction) for prediction in response.predictions]
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _submit_many(endpoint, instances, timeout=None):
+    # Multi-instance predict, split into VERTEX_BATCH_SIZE requests that run concurrently
+    return [(len(chunk), get_executor().submit(predict, endpoint, chunk, timeout=timeout))
+            for chunk in _chunks(list(instances), settings.VERTEX_BATCH_SIZE)]
+
+
+def _collect_many(endpoint, futures):
+    # One prediction per instance, or the exception of the request it was part of
+    predictions = []
+    for size, future in futures:
+        try:
+            predictions.extend(future.result())
+        except Exception as e:
+            logging.error(f"Vertex AI batch prediction failed. endpoint: {endpoint}, error: {str(e)}")
+            predictions.extend([e] * size)
+    return predictions
+
+
+def predict_many(endpoint, instances, timeout=None):
+    return _collect_many(endpoint, _submit_many(endpoint, instances, timeout=timeout))
+
+
+def predict_regressions(potential_instance, endpoints=REGRESSION_ENDPOINTS, timeout=None):
+    # Fan out to every regression endpoint at once, so latency is max() rather than sum() of the calls.
+    # Each call carries its own gRPC deadline.
+    futures = {endpoint: get_executor().submit(predict, endpoint, [potential_instance], timeout=timeout)
+               for endpoint in endpoints}
+    return {endpoint: future.result()[0]['value'] for endpoint, future in futures.items()}
+
+
+def _scenario_type(prediction):
+    confidences = list(prediction['confidences'])
+    return prediction['displayNames'][confidences.index(max(confidences))]
+
+
+def _predictions(scenario_type, revenue, vote_average):
+    return {'revenue': revenue,
+            'vote_average': vote_average,
+            'scenario':{'pred_type': int(scenario_type),
+                        'type_keyword': settings.SCENARIO_KEYWORDS[int(scenario_type)]["keywords"],
+            }
+    }
+
+
+def classify_scenario_type(scenario):
+    ## Prediction Scenario type
+    return _scenario_type(predict('classification', [{'mimeType': 'text/plain', 'content': scenario}])[0])
+
+
+def predict_potential(scenario_type, potential_instance):
+    ## Prediction Revenue, Vote Average
+    potential_instance = dict(potential_instance, scenario_type=scenario_type)
+    regressions = predict_regressions(potential_instance)
+    return _predictions(scenario_type, regressions['revenue'], regressions['vote_average'])
+
+
+def predict_scenario(scenario, potential_instance):
+    # Prediction Service API (Vertex AI)
+    return predict_potential(classify_scenario_type(scenario), potential_instance)
+
+
+def classify_scenario_types(scenarios):
+    # Batch version of classify_scenario_type; failed items hold the exception
+    predictions = predict_many('classification', [{'mimeType': 'text/plain', 'content': scenario}
+                                                  for scenario in scenarios])
+    return [prediction if isinstance(prediction, Exception) else _scenario_type(prediction)
+            for prediction in predictions]
+
+
+def predict_potentials(scenario_types, potential_instances, endpoints=REGRESSION_ENDPOINTS):
+    # Batch version of predict_potential; every regression endpoint gets all instances at once
+    instances = [dict(instance, scenario_type=scenario_type)
+                 for scenario_type, instance in zip(scenario_types, potential_instances)]
+    # submit every chunk of every endpoint before waiting on any of them
+    futures = {endpoint: _submit_many(endpoint, instances) for endpoint in endpoints}
+    regressions = {endpoint: _collect_many(endpoint, futures[endpoint]) for endpoint in endpoints}
+
+    results = []
+    for i, scenario_type in enumerate(scenario_types):
+        error = next((regressions[endpoint][i] for endpoint in endpoints
+                      if isinstance(regressions[endpoint][i], Exception)), None)
+        results.append(error if error is not None else
+                       _predictions(scenario_type, regressions['revenue'][i]['value'],
+                                    regressions['vote_average'][i]['value']))
+    return results
+
+
+# Async versions for the async views: the calls run on the event loop, without the executor
+
+
+async def apredict(endpoint, instances, client=None, timeout=None):
+    client = client or async_client_pool.get()
+    timeout = settings.VERTEX_TIMEOUT if timeout is None else timeout
+    instances = [json_format.ParseDict(instance, Value()) for instance in instances]
+    with upstream('vertex', endpoint):
+        response = await client.predict(endpoint=endpoint_paths()[endpoint], instances=instances,
+                                        parameters=EMPTY_PARAMETERS, timeout=timeout)
+    return [dict(prediction) for prediction in response.predictions]
+
+
+async def apredict_regressions(potential_instance, endpoints=REGRESSION_ENDPOINTS, timeout=None):
+    predictions = await asyncio.gather(*(apredict(endpoint, [potential_instance], timeout=timeout)
+                                         for endpoint in endpoints))
+    return {endpoint: prediction[0]['value'] for endpoint, prediction in zip(endpoints, predictions)}
+
+
+async def aclassify_scenario_type(scenario):
+    predictions = await apredict('classification', [{'mimeType': 'text/plain', 'content': scenario}])
+    return _scenario_type(predictions[0])
+
+
+async def apredict_potential(scenario_type, potential_instance):
+    potential_instance = dict(potential_instance, scenario_type=scenario_type)
+    regressions = await apredict_regressions(potential_instance)
+    return _predictions(scenario_type, regressions['revenue'], regressions['vote_average'])
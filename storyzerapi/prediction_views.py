@@ -0,0 +1,314 @@
+import json
+import logging
+import traceback
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .decorators import _get_user_id_from_auth, verify_user
+from .models import User
+from .module.batch import predict_movies, save_movie_results
+from .module.chatgpt import ChatGPT
+from .module.jobs import enqueue, enqueue_many
+from .module.prediction import run_movie_prediction, save_movie_result, stream_movie_prediction
+from .module.reference import movie_result_format
+from .module.translation import translate_en
+
+# Views that need the prediction stack (OpenAI, Vertex AI, the embedding model). Kept apart from
+# views.py so workers that only serve users, tokens and stored results never import it; urls.py
+# refers to these views through LazyView.
+
+
+class MoviePredictionView(APIView):
+    @method_decorator(verify_user)
+    @swagger_auto_schema(
+        operation_description="Predict movie genre",
+        manual_parameters=[
+            openapi.Parameter('async', openapi.IN_QUERY, description="1: queue the prediction and return a job id (202)", type=openapi.TYPE_INTEGER),
+        ],
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'title': openapi.Schema(type=openapi.TYPE_STRING, description='Movie title'),
+                'scenario': openapi.Schema(type=openapi.TYPE_STRING, description='Movie scenario'),
+                'budget': openapi.Schema(type=openapi.TYPE_STRING, description='Movie budget'),
+                'language': openapi.Schema(type=openapi.TYPE_STRING, description='Movie language'),
+                'runtime': openapi.Schema(type=openapi.TYPE_STRING, description='Movie runtime'),
+                'genres': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING), description='Movie genres'),
+            },
+            required=['title', 'scenario', 'budget', 'language', 'runtime', 'genres'],
+            example={
+                "title": "The Avengers",
+                "scenario": "When an unexpected enemy emerges and threatens global safety and security, Nick Fury, director of the international peacekeeping agency known as S.H.I.E.L.D., finds himself in need of a team to pull the world back from the brink of disaster. Spanning the globe, a daring recruitment effort begins!",
+                "budget": "220000000",
+                "language": "en",
+                "runtime": "143",
+                "genres": [
+                    "Science Fiction",
+                    "Action",
+                    "Adventure"
+                ]
+            }
+        ),
+        responses={
+            200: openapi.Response(
+                description='Movie genre predicted successfully',
+                examples={
+                    'application/json': {
+                        "revenue": 6097548,
+                        "vote_average": 6.407,
+                        "scenario": {
+                            "pred_type": 2,
+                            "type_keyword": {
+                                "woman": 52,
+                                "young": 44,
+                                "love": 38,
+                                "girl": 36,
+                                "father": 33,
+                                "man": 29,
+                                "new": 25,
+                                "daughter": 24,
+                                "wife": 22,
+                                "husband": 20
+                            }
+                        }
+                    }
+                }
+            ),
+            202: 'Prediction job queued',
+            400: 'Invalid request',
+        },
+    )
+    def post(self, request):
+        try:
+            user_id = _get_user_id_from_auth(request)
+            user_db = User.objects.get(id=user_id)
+        except AttributeError:
+            logging.error(f"User is not authenticated. \n{traceback.format_exc()}")
+            return Response({"error": "User is not authenticated"}, status=status.HTTP_401_UNAUTHORIZED)
+        except User.DoesNotExist:
+            logging.error(f"User does not exist. \n{traceback.format_exc()}")
+            return Response({"error": "User does not exist"}, status=status.HTTP_400_BAD_REQUEST)
+        if user_db is None:
+            logging.error(f"User does not exist. user_id: {user_id}")
+            
+        # TODO: Input Json이 형식에 맞는 key값을 가지고 있는지 검증
+        input_keys = movie_result_format().input_keys
+
+        # Asynchronous mode: queue the job for run_prediction_worker and return immediately
+        if request.query_params.get('async') in ('1', 'true'):
+            job = enqueue(user_id, request.data)
+            return Response({"job_id": str(job.id), "status": job.status,
+                             "status_url": reverse('movie-prediction-job', args=[job.id])},
+                            status=status.HTTP_202_ACCEPTED)
+        
+        run = run_movie_prediction(request.data)
+        predictions = run['predict']
+        reply = run['analysis']
+        logging.info(f"Movie prediction finished. total: {run.total:.3f}s, critical_path: {run.critical_path}")
+
+        save_movie_result(user_id, request.data, predictions, reply)
+        
+        return Response({"input": request.data, 
+                         "output": predictions, 
+                         "analyze": reply, "category": "movie"
+                         }, status=status.HTTP_200_OK)
+        
+class MoviePredictionBatchView(APIView):
+    @method_decorator(verify_user)
+    @swagger_auto_schema(
+        operation_description="Predict many movies in one request. Each item has the same fields as /movie/prediction. "
+                              "Items fail independently and are reported with the stage that failed. "
+                              "With async=1 every movie is queued as a prediction job instead.",
+        manual_parameters=[
+            openapi.Parameter('async', openapi.IN_QUERY, description="1: queue one job per movie and return the job ids (202)", type=openapi.TYPE_INTEGER),
+        ],
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'movies': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT), description='Movie inputs'),
+            },
+            required=['movies'],
+        ),
+        responses={
+            200: 'Per-item results',
+            202: 'Prediction jobs queued',
+            400: 'Invalid request',
+        },
+    )
+    def post(self, request: Request):
+        user_id = _get_user_id_from_auth(request)
+        movies = request.data if isinstance(request.data, list) else request.data.get('movies')
+        if not isinstance(movies, list) or not movies:
+            return Response({"error": "movies must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        invalid = [index for index, movie in enumerate(movies) if not isinstance(movie, dict)]
+        if invalid:
+            return Response({"error": f"movies must be JSON objects, invalid indexes: {invalid}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Asynchronous mode: one job per movie for run_prediction_worker, each saved as it finishes
+        if request.query_params.get('async') in ('1', 'true'):
+            if len(movies) > settings.BATCH_ASYNC_MAX_ITEMS:
+                return Response({"error": f"At most {settings.BATCH_ASYNC_MAX_ITEMS} movies per request"}, status=status.HTTP_400_BAD_REQUEST)
+            jobs = enqueue_many(user_id, movies)
+            return Response({"jobs": [{"index": index, "job_id": str(job.id), "status": job.status,
+                                       "status_url": reverse('movie-prediction-job', args=[job.id])}
+                                      for index, job in enumerate(jobs)],
+                             }, status=status.HTTP_202_ACCEPTED)
+
+        # Answered inline, so the batch has to fit in the worker timeout
+        if len(movies) > settings.BATCH_MAX_ITEMS:
+            return Response({"error": f"At most {settings.BATCH_MAX_ITEMS} movies per request, "
+                                      f"use ?async=1 for larger batches"}, status=status.HTTP_400_BAD_REQUEST)
+
+        items = predict_movies(movies)
+        try:
+            save_movie_results(user_id, items)
+        except Exception as e:
+            logging.error(f"Error occurred while saving batch results. error: {str(e)}\n{traceback.format_exc()}")
+            return Response({"error": f"Error occurred while saving results. error: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        results_list = [item.to_dict() for item in items]
+        succeeded = sum(1 for item in items if item.ok)
+        return Response({"results": results_list,
+                         "succeeded": succeeded,
+                         "failed": len(items) - succeeded,
+                         }, status=status.HTTP_200_OK)
+
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+class MoviePredictionStreamView(APIView):
+    @method_decorator(verify_user)
+    @swagger_auto_schema(
+        operation_description="Predict movie performance and stream the analysis as Server-Sent Events. "
+                              "Events: 'prediction' (numeric predictions), 'analysis' ({\"delta\": text}), "
+                              "'done' (saved result), 'error'.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'title': openapi.Schema(type=openapi.TYPE_STRING, description='Movie title'),
+                'scenario': openapi.Schema(type=openapi.TYPE_STRING, description='Movie scenario'),
+                'budget': openapi.Schema(type=openapi.TYPE_STRING, description='Movie budget'),
+                'language': openapi.Schema(type=openapi.TYPE_STRING, description='Movie language'),
+                'runtime': openapi.Schema(type=openapi.TYPE_STRING, description='Movie runtime'),
+                'genres': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING), description='Movie genres'),
+            },
+            required=['title', 'scenario', 'budget', 'language', 'runtime', 'genres'],
+        ),
+        responses={
+            200: 'text/event-stream',
+            401: 'User is not authenticated',
+        },
+    )
+    def post(self, request: Request):
+        user_id = _get_user_id_from_auth(request)
+        data = request.data
+
+        def events():
+            yield ": prediction started\n\n" # sent right away so the client sees the first byte
+            predictions = None
+            try:
+                for event, value in stream_movie_prediction(data):
+                    if event == 'predictions':
+                        predictions = value
+                        yield _sse_event('prediction', predictions)
+                    elif event == 'analysis':
+                        yield _sse_event('analysis', {"delta": value})
+                    else:
+                        results = save_movie_result(user_id, data, predictions, value)
+                        yield _sse_event('done', {"id": results.id, "input": data, "output": predictions,
+                                                  "analyze": value, "category": "movie"})
+            except Exception as e:
+                logging.error(f"Streaming prediction failed. error: {str(e)}\n{traceback.format_exc()}")
+                yield _sse_event('error', {"error": f"Error occurred while predicting. error: {str(e)}"})
+
+        response = StreamingHttpResponse(events(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no' # disable proxy buffering (nginx)
+        return response
+
+class ChatGPTView(APIView):
+    @swagger_auto_schema(
+        operation_description="Chat with GPT-3.5-turbo",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT, # Request body will be in JSON format
+            properties={
+                'system_prompt': openapi.Schema(type=openapi.TYPE_STRING, description='System prompt'),
+                'user_prompt': openapi.Schema(type=openapi.TYPE_STRING, description='User prompt'),
+            },
+        ),
+        responses={
+            200: 'Text analyzed successfully',
+            400: 'Invalid request',
+        },
+    )
+    def post(self, request: Request):
+        # if user_db is None: # TODO: 유저 로그인 검증 부분 별도의 데코레이터로 분리
+        #     logging.error(f"User does not exist. user_id: {user_id}")
+        #     return Response({"error": "User does not exist"}, status=status.HTTP_400_BAD_REQUEST)
+        # elif not user_db.is_verified:
+        #     logging.error(f"User is not verified. user_id: {user_id}")
+        #     return Response({"error": "User is not verified"}, status=status.HTTP_401_UNAUTHORIZED)
+        
+        # post data in json format
+        system_prompt = request.data.get('system_prompt')
+        user_prompt = request.data.get('user_prompt')
+        
+        reply = ChatGPT(user_prompt, system_prompt, model="gpt-3.5-turbo").chatgpt_request()
+        
+        return Response({"message": reply}, status=status.HTTP_200_OK)
+    
+class ChatGPTAnalyzesView(APIView):
+    @swagger_auto_schema(
+        operation_description="Analyze text using chatgpt",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT, # Request body will be in JSON format
+            properties={
+                'input': openapi.Schema(type=openapi.TYPE_STRING, description='Input'),
+                'output': openapi.Schema(type=openapi.TYPE_STRING, description='Output'),
+            },
+        ),
+        responses={
+            200: 'Text analyzed successfully',
+            400: 'Invalid request',
+        },
+    )
+    def post(self, request):
+        system_prompt = """I want you to act as a movie predictor.
+        I will give you a movie title, scenario, budget, original language, runtime, and genres in json format.
+        And I will give you the prediction result of the movie, revenue, and vote average in json format.
+        Explain the prediction result of the movie, revenue, and vote average."""
+        user_prompt = "input" + request.data.get('input') + "\n" + "output" + request.data.get('output')
+        reply = ChatGPT(user_prompt, system_prompt).chatgpt_request()
+
+        return Response({"message": reply}, status=status.HTTP_200_OK)
+
+class ChatGPTTranslateView(APIView):
+    @method_decorator(verify_user)
+    @swagger_auto_schema(
+        operation_description="Translate text using GPT-3.5-turbo",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT, # Request body will be in JSON format
+            properties={
+                'context': openapi.Schema(type=openapi.TYPE_STRING, description='Context'),
+            },
+        ),
+        responses={
+            200: 'Text translated successfully',
+            400: 'Invalid request',
+        },
+    )
+    def post(self, request):
+        user_prompt = request.data.get('context')
+        
+        reply = translate_en(user_prompt)
+        
+        return Response({"message": reply}, status=status.HTTP_200_OK)
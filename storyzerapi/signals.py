@@ -0,0 +1,29 @@
+import logging
+import traceback
+
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Results
+from .module.timing import count_query
+
+
+@receiver(post_save, sender=Results)
+def update_genre_statistics(sender, instance, created, **kwargs):
+    if not created:
+        return
+    from .module.genre_stats import record_results # numpy, not needed by workers that never save results
+
+    try:
+        record_results([instance])
+    except Exception as e:
+        # statistics must never make saving a result fail
+        logging.error(f"Failed to update genre statistics. result_id: {instance.id}, error: {str(e)}\n{traceback.format_exc()}")
+
+
+@receiver(connection_created)
+def count_request_queries(sender, connection, **kwargs):
+    # connection_created fires on every reconnect of the same wrapper, add the hook only once
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
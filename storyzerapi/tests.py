@@ -1,3 +1,71 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from .module.pipeline import Pipeline, Stage
+
+
+def _stage(name, requires=(), func=None):
+    return Stage(name, func or (lambda ctx: name), requires=requires)
+
+
+class PipelineTests(SimpleTestCase):
+    def setUp(self):
+        #   a -> b --+
+        #   c -------+-> d
+        self.pipeline = Pipeline([
+            _stage('d', ['b', 'c']),
+            _stage('b', ['a']),
+            _stage('a'),
+            _stage('c'),
+        ])
+
+    def test_topological_order(self):
+        order = self.pipeline.order
+        self.assertEqual(sorted(order), ['a', 'b', 'c', 'd'])
+        for name, requires in self.pipeline.graph().items():
+            for dep in requires:
+                self.assertLess(order.index(dep), order.index(name))
+
+    def test_cycle_is_rejected(self):
+        with self.assertRaisesRegex(ValueError, 'cycle'):
+            Pipeline([_stage('a', ['b']), _stage('b', ['a'])])
+
+    def test_unknown_and_duplicate_stages_are_rejected(self):
+        with self.assertRaisesRegex(ValueError, 'Unknown stage'):
+            Pipeline([_stage('a', ['missing'])])
+        with self.assertRaises(ValueError):
+            Pipeline([_stage('a'), _stage('a')])
+
+    def test_critical_path(self):
+        self.assertEqual(self.pipeline.critical_path({'a': 1.0, 'b': 1.0, 'c': 3.0, 'd': 1.0}), ['c', 'd'])
+        self.assertEqual(self.pipeline.critical_path({'a': 2.0, 'b': 2.0, 'c': 3.0, 'd': 1.0}), ['a', 'b', 'd'])
+        self.assertEqual(Pipeline([]).critical_path({}), [])
+
+    def test_upto(self):
+        self.assertEqual(sorted(self.pipeline.upto('b').order), ['a', 'b'])
+        self.assertEqual(sorted(self.pipeline.upto('c').order), ['c'])
+        self.assertEqual(sorted(self.pipeline.upto('d').order), ['a', 'b', 'c', 'd'])
+
+    def test_run_passes_outputs_to_dependents(self):
+        pipeline = Pipeline([
+            _stage('a', func=lambda ctx: ctx['x'] + 1),
+            _stage('b', ['a'], func=lambda ctx: ctx['a'] * 10),
+        ])
+        run = pipeline.run({'x': 1})
+        self.assertEqual(run['a'], 2)
+        self.assertEqual(run['b'], 20)
+        self.assertEqual(set(run.durations), {'a', 'b'})
+        self.assertEqual(run.critical_path, ['a', 'b'])
+
+    def test_failing_stage_propagates(self):
+        def fail(ctx):
+            raise RuntimeError('stage failed')
+
+        called, events = [], []
+        pipeline = Pipeline([
+            _stage('a', func=fail),
+            _stage('b', ['a'], func=lambda ctx: called.append('b')),
+        ])
+        with self.assertRaisesRegex(RuntimeError, 'stage failed'):
+            pipeline.run({}, on_stage=lambda name, status: events.append((name, status)))
+        self.assertEqual(called, [])
+        self.assertIn(('a', 'failed'), events)
@@ -1,9 +1,11 @@
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path
 
 from . import views
+from .lazy import AsyncLazyView, LazyView
 
-urlpatterns = [
+# Users, e-mail, stored results: many small workers (storyzer.urls_api)
+api_urlpatterns = [
     # User
     path('users/', views.UserViewSet.as_view({'post': 'create'}), name='user-create'),
     path('users/detail', views.UserDetailView.as_view(), name='user-detail'),
@@ -12,18 +14,42 @@ urlpatterns = [
     path('password/reset/', views.PasswordResetView.as_view(), name='password-reset'),
     path('password/reset/confirm/', views.PasswordResetConfirmView.as_view(), name='password-reset-confirm'),
     
-    path('chatgpt/translate/', views.ChatGPTTranslateView.as_view(), name='chatgpt-translate'),
-    # path('chatgpt/analyze/', views.ChatGPTAnalyzesView.as_view(), name='chatgpt-analyzes', ),
-    path('chatgpt/', views.ChatGPTView.as_view(), name='chatgpt'),
-    
-    # 영화 분석
-    path('movie/prediction', views.MoviePredictionView.as_view(), name='movie-prediction'),
-    
     # 평균
     path('average/genres', views.AverageGenresView.as_view(), name='average-genres'),
+    path('average/genres/results', views.ResultGenresView.as_view(), name='average-genres-results'),
     
     
     # 결과 저장
     # path('result/save', views.ResultSaveView.as_view(), name='result-save'),
     path('result/list', views.ResultListView.as_view(), name='result-list'),
-]
\ No newline at end of file
+]
+
+
+def async_view(name):
+    # Native async implementation under ASGI (settings.ASYNC_VIEWS), the DRF view otherwise
+    if settings.ASYNC_VIEWS:
+        return AsyncLazyView(f'storyzerapi.async_views.{name}')
+    return LazyView(f'storyzerapi.prediction_views.{name}')
+
+# OpenAI, Vertex AI and the embedding model: a few workers with the model preloaded (storyzer.urls_prediction)
+prediction_urlpatterns = [
+    path('chatgpt/translate/', async_view('ChatGPTTranslateView'), name='chatgpt-translate'),
+    # path('chatgpt/analyze/', LazyView('storyzerapi.prediction_views.ChatGPTAnalyzesView'), name='chatgpt-analyzes', ),
+    path('chatgpt/', async_view('ChatGPTView'), name='chatgpt'),
+    
+    # 영화 분석
+    path('movie/prediction', async_view('MoviePredictionView'), name='movie-prediction'),
+    path('movie/prediction/batch', LazyView('storyzerapi.prediction_views.MoviePredictionBatchView'), name='movie-prediction-batch'),
+    path('movie/prediction/stream', async_view('MoviePredictionStreamView'), name='movie-prediction-stream'),
+]
+
+# Served by both kinds of workers
+common_urlpatterns = [
+    # status_url of ?async=1 predictions is reversed in prediction workers
+    path('movie/prediction/<uuid:job_id>', views.MoviePredictionJobView.as_view(), name='movie-prediction-job'),
+    
+    # 모니터링
+    path('metrics', views.MetricsView.as_view(), name='metrics'),
+]
+
+urlpatterns = api_urlpatterns + prediction_urlpatterns + common_urlpatterns